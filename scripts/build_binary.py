@@ -0,0 +1,50 @@
+"""使用 Nuitka 将 stdio 入口编译为独立可执行文件
+
+用法:
+    pip install nuitka
+    python scripts/build_binary.py
+
+产物位于 dist/cli.dist/mcp-server-12306（Windows 下为 mcp-server-12306.exe），
+可直接作为 MCP 客户端的 command 使用。编译只加快解释器启动与模块导入，
+事件循环和请求处理逻辑与源码运行时相同。
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+SRC_DIR = PROJECT_ROOT / "src"
+ENTRY = SRC_DIR / "mcp_12306" / "cli.py"
+OUTPUT_DIR = PROJECT_ROOT / "dist"
+OUTPUT_NAME = "mcp-server-12306"
+
+
+def build():
+    cmd = [
+        sys.executable, "-m", "nuitka",
+        "--standalone",
+        "--follow-imports",
+        "--include-package=mcp_12306",
+        # station_name.js 等资源文件
+        "--include-package-data=mcp_12306",
+        f"--output-dir={OUTPUT_DIR}",
+        f"--output-filename={OUTPUT_NAME}",
+        "--assume-yes-for-downloads",
+        str(ENTRY),
+    ]
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC_DIR), env.get("PYTHONPATH")]))
+
+    print("🔨 正在使用 Nuitka 编译 stdio 入口...")
+    print(" ".join(cmd))
+    result = subprocess.run(cmd, cwd=PROJECT_ROOT, env=env)
+    if result.returncode != 0:
+        print("❌ 编译失败")
+        sys.exit(result.returncode)
+    print(f"✅ 编译完成，输出目录: {OUTPUT_DIR}")
+
+
+if __name__ == "__main__":
+    build()
@@ -1,6 +1,5 @@
 """启动服务器脚本"""
 
-import asyncio
 import sys
 import logging
 from pathlib import Path
@@ -56,22 +55,10 @@ def main():
             sys.exit(1)
             
         # 导入并运行服务器
-        from mcp_12306.server import main_server
+        from mcp_12306.server import main as run_server
         
         logger.info("🚀 启动12306 MCP服务器...")
-        
-        # 检查是否已有事件循环运行
-        try:
-            # 尝试获取当前事件循环
-            loop = asyncio.get_running_loop()
-            logger.info("检测到运行中的事件循环，使用当前循环")
-            # 在当前循环中运行
-            task = loop.create_task(main_server())
-            loop.run_until_complete(task)
-        except RuntimeError:
-            # 没有运行中的事件循环，创建新的
-            logger.info("创建新的事件循环")
-            asyncio.run(main_server())
+        run_server()
         
     except ImportError as e:
         logger.error(f"❌ 导入错误: {e}")
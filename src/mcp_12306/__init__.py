@@ -1,5 +1,6 @@
 """12306 MCP服务器包"""
 
-__version__ = "0.3.1.post20260211"
+from ._version import __version__
+
 __author__ = "Drfccv"
 __email__ = "2713587802@qq.com"
\ No newline at end of file
@@ -0,0 +1,3 @@
+"""版本信息"""
+
+__version__ = "0.3.1.post20260211"
@@ -5,19 +5,12 @@ This module provides the command-line interface for running the MCP Server 12306
 in stdio mode, suitable for use with Claude Desktop and other MCP clients.
 """
 
-import asyncio
 import sys
-import logging
-import argparse
-from mcp_12306 import __version__
 
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
-def main():
-    """Main entry point for the CLI command"""
-    parser = argparse.ArgumentParser(
-        description="MCP Server for 12306 Ticket Query (Stdio Mode)",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
+_DESC = "MCP Server for 12306 Ticket Query (Stdio Mode)"
+_EPILOG = """
 Examples:
   # Run the MCP server (wait for JSON-RPC on stdin)
   mcp-server-12306
@@ -25,30 +18,87 @@ Examples:
   # Show version
   mcp-server-12306 --version
 """
+
+
+def _configure_logging():
+    """配置日志输出到 stderr，避免干扰 stdio 通信"""
+    import logging
+
+    class RawStderrHandler(logging.Handler):
+        """直接向 sys.stderr.buffer 写入 UTF-8 字节，绕过 TextIOWrapper 的编码与加锁"""
+
+        def emit(self, record):
+            try:
+                stream = sys.stderr.buffer
+                stream.write((self.format(record) + "\n").encode("utf-8", "replace"))
+                stream.flush()
+            except Exception:
+                self.handleError(record)
+
+    # stderr 被替换为无底层缓冲区的对象时（如 pythonw、测试捕获），退回标准 StreamHandler
+    if getattr(sys.stderr, "buffer", None) is not None:
+        handler = RawStderrHandler()
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    logging.basicConfig(level=logging.INFO, handlers=[handler])
+    return logging.getLogger("mcp_12306.cli")
+
+
+async def _serve(log, run_stdio_server):
+    """运行 stdio 服务器，收到 SIGINT/SIGTERM 时直接取消主任务"""
+    import asyncio
+    import signal
+
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, task.cancel)
+        except NotImplementedError:
+            # Windows 事件循环不支持 add_signal_handler
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(task.cancel))
+
+    try:
+        await run_stdio_server()
+    except asyncio.CancelledError:
+        log.info("收到中断信号，正在关闭服务器...")
+
+
+def _parse_args():
+    """解析命令行参数（仅在传入参数时调用）"""
+    import argparse
+    from mcp_12306._version import __version__
+
+    parser = argparse.ArgumentParser(
+        description=_DESC,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=_EPILOG
     )
     parser.add_argument(
         "--version", 
         action="version", 
         version=f"%(prog)s {__version__}"
     )
-    args = parser.parse_args()
+    return parser.parse_args()
+
+
+def main():
+    """Main entry point for the CLI command"""
+    # MCP 客户端通常不带参数启动，此时跳过 argparse
+    if len(sys.argv) > 1:
+        _parse_args()
+
+    # 先配置日志再导入服务器模块，导入期间的日志同样输出到 stderr
+    log = _configure_logging()
 
-    # 配置日志输出到 stderr，避免干扰 stdio 通信
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        stream=sys.stderr
-    )
-    
     # 运行 stdio 服务器
-    from mcp_12306.stdio_server import run_stdio_server
-    
     try:
-        asyncio.run(run_stdio_server())
-    except KeyboardInterrupt:
-        logging.info("收到中断信号，正在关闭服务器...")
+        from mcp_12306.stdio_server import run_stdio_server
+        from mcp_12306.utils.event_loop import run_event_loop
+        run_event_loop(_serve(log, run_stdio_server))
     except Exception as e:
-        logging.error(f"服务器运行失败: {e}", exc_info=True)
+        log.error("服务器运行失败: %s", e, exc_info=True)
         sys.exit(1)
 
 
@@ -1,1543 +1,1721 @@
-import asyncio
-import json
-import logging
-import httpx
-from datetime import datetime, date
-from typing import Dict, List, Any
-import uuid
-import pytz
-import re
-
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse, Response
-from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
-
-from .services.station_service import StationService
-from .utils.config import get_settings
-from .utils.date_utils import validate_date, validate_date_not_past
-from . import __version__
-
-settings = get_settings()
-
-logging.basicConfig(
-    level=getattr(logging, settings.log_level.upper(), logging.INFO),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
-logger = logging.getLogger(__name__)
-station_service = StationService()
-
-# MCP Protocol Version - Support 2025-03-26 Streamable HTTP transport
-MCP_PROTOCOL_VERSION = "2025-03-26"  # Updated to latest protocol version
-SERVER_NAME = "mcp-server-12306"
-SERVER_VERSION = __version__
-
-USER_AGENT = (
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-    "AppleWebKit/537.36 (KHTML, like Gecko) "
-    "Chrome/123.0.0.0 Safari/537.36"
-)
-
-# 中国铁路 12306 API 常量 - URL
-HTTP_URLS = {
-    "init": "https://kyfw.12306.cn/otn/leftTicket/init",
-    "query_left_ticket": "https://kyfw.12306.cn/otn/leftTicket/queryG",
-    "query_transfer": "https://kyfw.12306.cn/lcquery/queryG",
-    "query_price": "https://kyfw.12306.cn/otn/leftTicketPrice/queryAllPublicPrice",
-    "query_route_stations": "https://kyfw.12306.cn/otn/czxx/queryByTrainNo",
-}
-
-# 中国铁路 12306 API 通用请求头
-HTTP_HEADERS = {
-    "User-Agent": USER_AGENT,
-    "Referer": "https://kyfw.12306.cn/otn/leftTicket/init",
-    "Host": "kyfw.12306.cn",
-    "Accept": "application/json, text/javascript, */*; q=0.01",
-    "Accept-Language": "zh-CN,zh;q=0.9",
-    "Connection": "keep-alive",
-    "X-Requested-With": "XMLHttpRequest",
-    "Origin": "https://kyfw.12306.cn"
-}
-
-# Connected clients for session management
-connected_clients: Dict[str, Dict] = {}
-
-# MCP Tools Definition according to spec
-MCP_TOOLS = [
-    {
-        "name": "query-tickets",
-        "description": "官方12306余票/车次/座席/时刻一站式查询。输入出发站、到达站、日期，返回所有可购车次、时刻、历时、各席别余票等详细信息。支持中文名、三字码。\n\n【智能筛选指南】返回结果通常包含出发/到达城市的所有相关车站（如北京/北京西/北京南）。请根据用户输入语境灵活处理：\n1. 用户仅输入城市名（如'九江'）：请展示所有相关站点的车次，不要过滤。\n2. 用户指定具体车站（如'九江站'）：优先展示匹配车站的车次，但若其他同城车站有更优方案（如时间更短、有票），也应作为补充选项提供。\n请避免机械地仅通过字符串匹配过滤车次，以免遗漏用户可能感兴趣的出行方案。",
-        "inputSchema": {
-            "$schema": "http://json-schema.org/draft-07/schema#",
-            "type": "object",
-            "title": "车票查询参数",
-            "description": "查询火车票所需的参数",
-            "properties": {
-                "from_station": {"type": "string", "title": "出发站", "description": "出发车站名称，例如：北京、上海、广州", "minLength": 1},
-                "to_station": {"type": "string", "title": "到达站", "description": "到达车站名称，例如：北京、上海、广州", "minLength": 1},
-                "train_date": {"type": "string", "title": "出发日期", "description": "出发日期，格式：YYYY-MM-DD", "pattern": "^\\d{4}-\\d{2}-\\d{2}$"}
-            },
-            "required": ["from_station", "to_station", "train_date"],
-            "additionalProperties": False
-        }
-    },
-    {
-        "name": "query-ticket-price",
-        "description": "查询火车票价信息。输入出发站、到达站、日期，返回各车次的票价详情。支持指定车次号过滤。\n\n【智能筛选指南】返回结果通常包含出发/到达城市的所有相关车站（如北京/北京西/北京南）。请根据用户输入语境灵活处理：\n1. 用户仅输入城市名（如'九江'）：请展示所有相关站点的车次，不要过滤。\n2. 用户指定具体车站（如'九江站'）：优先展示匹配车站的车次，但若其他同城车站有更优方案（如时间更短、有票），也应作为补充选项提供。\n请避免机械地仅通过字符串匹配过滤车次，以免遗漏用户可能感兴趣的出行方案。",
-        "inputSchema": {
-            "$schema": "http://json-schema.org/draft-07/schema#",
-            "type": "object",
-            "title": "票价查询参数",
-            "properties": {
-                "from_station": {"type": "string", "title": "出发站", "minLength": 1},
-                "to_station": {"type": "string", "title": "到达站", "minLength": 1},
-                "train_date": {"type": "string", "title": "出发日期", "pattern": "^\\d{4}-\\d{2}-\\d{2}$"},
-                "train_code": {"type": "string", "title": "车次号（可选）", "description": "指定车次号（如G123），若提供则只返回该车次信息"},
-                "purpose_codes": {"type": "string", "title": "乘客类型", "description": "ADULT=成人, 0X=学生", "default": "ADULT"}
-            },
-            "required": ["from_station", "to_station", "train_date"],
-            "additionalProperties": False
-        }
-    },
-    {
-        "name": "search-stations",
-        "description": "智能车站搜索。支持中文名、拼音、简拼、三字码（Code）。可用于模糊搜索（如“北京”），也可用于精确获取车站代码（如输入“BJP”返回北京站信息）。",
-        "inputSchema": {
-            "$schema": "http://json-schema.org/draft-07/schema#",
-            "type": "object",
-            "title": "车站搜索参数",
-            "description": "搜索火车站所需的参数",
-            "properties": {
-                "query": {"type": "string", "title": "搜索关键词", "description": "车站搜索关键词，支持：车站名称、拼音、简拼等", "minLength": 1, "maxLength": 20},
-                "limit": {"type": "integer", "title": "结果数量限制", "description": "返回结果的最大数量", "minimum": 1, "maximum": 50, "default": 10}
-            },
-            "required": ["query"],
-            "additionalProperties": False
-        }
-    },
-    {
-        "name": "query-transfer",
-        "description": "官方中转换乘方案查询。输入出发站、到达站、日期，可选中转站/无座/学生票，自动分页抓取全部中转方案，输出每段车次、时刻、余票、等候时间、总历时等详细信息。",
-        "inputSchema": {
-            "$schema": "http://json-schema.org/draft-07/schema#",
-            "type": "object",
-            "title": "中转查询参数",
-            "description": "查询A到B的中转换乘（含一次换乘）",
-            "properties": {
-                "from_station": {"type": "string", "title": "出发站"},
-                "to_station": {"type": "string", "title": "到达站"},
-                "train_date": {"type": "string", "title": "出发日期", "pattern": "^\\d{4}-\\d{2}-\\d{2}$"},
-                "middle_station": {"type": "string", "title": "中转站（可选）", "description": "指定中转站名称或三字码，可选"},
-                "isShowWZ": {"type": "string", "title": "是否显示无座车次（Y/N）", "description": "Y=显示无座车次，N=不显示，默认N", "default": "N"},
-                "purpose_codes": {"type": "string", "title": "乘客类型（00=普通，0X=学生）", "description": "00为普通，0X为学生，默认00"}
-            },
-            "required": ["from_station", "to_station", "train_date"],
-            "additionalProperties": False
-        }
-    },
-    {
-        "name": "get-train-route-stations",
-        "description": "列车经停站全表查询。支持输入车次号或官方编号，自动转换，返回所有经停站、到发时刻、停留时间。支持三字码/全名。",
-        "inputSchema": {
-            "$schema": "http://json-schema.org/draft-07/schema#",
-            "type": "object",
-            "title": "列车经停站查询参数",
-            "properties": {
-                "train_no": {"type": "string", "title": "车次编码", "minLength": 1},
-                "from_station": {"type": "string", "title": "出发站id", "minLength": 1},
-                "to_station": {"type": "string", "title": "到达站id", "minLength": 1},
-                "train_date": {"type": "string", "title": "出发日期", "pattern": "^\\d{4}-\\d{2}-\\d{2}$"}
-            },
-            "required": ["train_no", "from_station", "to_station", "train_date"],
-            "additionalProperties": False
-        }
-    },
-    {
-        "name": "get-train-no-by-train-code",
-        "description": "车次号转官方唯一编号（train_no），支持三字码/全名。常用于经停站查询前置转换。",
-        "inputSchema": {
-            "$schema": "http://json-schema.org/draft-07/schema#",
-            "type": "object",
-            "title": "车次号转编号参数",
-            "properties": {
-                "train_code": {"type": "string", "title": "车次号", "minLength": 1},
-                "from_station": {"type": "string", "title": "出发站id或全名", "minLength": 1},
-                "to_station": {"type": "string", "title": "到达站id或全名", "minLength": 1},
-                "train_date": {"type": "string", "title": "出发日期", "pattern": "^\\d{4}-\\d{2}-\\d{2}$"}
-            },            "required": ["train_code", "from_station", "to_station", "train_date"],
-            "additionalProperties": False
-        }
-    },
-    {
-        "name": "get-current-time",
-        "description": "获取当前日期和时间信息，支持相对日期计算。返回当前日期、时间，以及常用的相对日期（明天、后天等），方便用户在查询火车票时选择正确的日期。",
-        "inputSchema": {
-            "$schema": "http://json-schema.org/draft-07/schema#",
-            "type": "object",
-            "title": "获取当前时间参数",
-            "description": "获取当前时间和日期信息",
-            "properties": {
-                "timezone": {"type": "string", "title": "时区", "description": "时区设置，默认为中国时区", "default": "Asia/Shanghai"},
-                "format": {"type": "string", "title": "日期格式", "description": "返回的日期格式，默认为YYYY-MM-DD", "default": "YYYY-MM-DD"}
-            },
-            "additionalProperties": False
-        }
-    }
-]
-
-app = FastAPI(
-    title=SERVER_NAME,
-    version=SERVER_VERSION,
-    description=f"基于MCP协议(2025-03-26 Streamable HTTP)的12306火车票查询服务，支持直达、过站和换乘查询",
-    debug=settings.debug
-)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"]
-)
-
-@app.get("/")
-async def root():
-    return {
-        "name": SERVER_NAME,
-        "version": SERVER_VERSION,
-        "status": "running",
-        "mcp_endpoint": "/mcp",
-        "protocol_version": MCP_PROTOCOL_VERSION,
-        "transport": "Streamable HTTP (2025-03-26)",
-        "stations_loaded": len(station_service.stations),
-        "tools": [tool["name"] for tool in MCP_TOOLS],
-        "active_sessions": len(connected_clients)
-    }
-
-@app.get("/health")
-async def health():
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "stations": len(station_service.stations),
-        "active_sessions": len(connected_clients)
-    }
-
-@app.get("/schema/tools")
-async def get_tools_schema():
-    return {
-        "tools": MCP_TOOLS,
-        "schema_version": "http://json-schema.org/draft-07/schema#"
-    }
-
-# MCP Streamable HTTP Transport Endpoints (2025-03-26 spec)
-
-@app.options("/mcp")
-async def mcp_options():
-    """Handle CORS preflight for /mcp endpoint"""
-    return JSONResponse(
-        {},
-        headers={
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, POST, DELETE, OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type, Authorization, Mcp-Session-Id",
-        }
-    )
-
-@app.get("/mcp")
-async def mcp_endpoint_get(request: Request):
-    """MCP Streamable HTTP Endpoint - GET for SSE connection (optional)"""
-    # Generate session ID for this connection
-    session_id = str(uuid.uuid4())
-    logger.info(f"New MCP GET connection established - Session ID: {session_id}")
-    
-    # Store client connection info
-    connected_clients[session_id] = {
-        "connected_at": datetime.now().isoformat(),
-        "user_agent": request.headers.get("user-agent", ""),
-        "client_ip": request.client.host if request.client else "unknown",
-        "initialized": False,
-        "protocol_version": MCP_PROTOCOL_VERSION
-    }
-    
-    async def generate_events():
-        try:
-            # Keep connection alive with periodic pings
-            while True:
-                await asyncio.sleep(30)  # Send ping every 30 seconds
-                yield f"event: ping\ndata: {{\"timestamp\": \"{datetime.now().isoformat()}\"}}\n\n"
-                
-        except asyncio.CancelledError:
-            logger.info(f"MCP GET connection closed - Session ID: {session_id}")
-            # Clean up client connection
-            if session_id in connected_clients:
-                del connected_clients[session_id]
-        except Exception as e:
-            logger.error(f"MCP GET error for session {session_id}: {e}")
-            # Clean up client connection
-            if session_id in connected_clients:
-                del connected_clients[session_id]
-    
-    return StreamingResponse(
-        generate_events(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "*",
-            "X-Accel-Buffering": "no",  # Disable nginx buffering
-            "Mcp-Session-Id": session_id  # Return session ID in header
-        }
-    )
-
-@app.post("/mcp")
-async def mcp_endpoint_post(request: Request):
-    """MCP Streamable HTTP Endpoint - POST for JSON-RPC messages"""
-    request_id = None
-    try:
-        data = await request.json()
-        
-        # Validate JSON-RPC 2.0 format
-        if not isinstance(data, dict) or data.get("jsonrpc") != "2.0":
-            raise HTTPException(status_code=400, detail="Invalid JSON-RPC 2.0 message")
-        
-        method = data.get("method")
-        params = data.get("params", {})
-        request_id = data.get("id")
-        
-        if not method:
-            raise HTTPException(status_code=400, detail="Method is required")
-        
-        logger.info(f"Received MCP request: {method} (ID: {request_id})")
-        
-        # Handle initialization - no session ID required for this
-        if method == "initialize":
-            client_capabilities = params.get("capabilities", {})
-            client_protocol_version = params.get("protocolVersion", MCP_PROTOCOL_VERSION)
-            client_info = params.get("clientInfo", {})
-            
-            logger.info(f"Initialize request - Client Protocol: {client_protocol_version}")
-            logger.info(f"Client Info: {client_info}")
-            
-            # Generate new session ID for this client
-            session_id = str(uuid.uuid4())
-            
-            # Store session info
-            connected_clients[session_id] = {
-                "connected_at": datetime.now().isoformat(),
-                "user_agent": request.headers.get("user-agent", ""),
-                "client_ip": request.client.host if request.client else "unknown",
-                "initialized": False,
-                "protocol_version": client_protocol_version
-            }
-            
-            # Accept the client's protocol version or use our default
-            accepted_version = client_protocol_version if client_protocol_version else MCP_PROTOCOL_VERSION
-            
-            response = {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "result": {
-                    "protocolVersion": accepted_version,
-                    "serverInfo": {
-                        "name": SERVER_NAME,
-                        "version": SERVER_VERSION,
-                        "description": "12306火车票查询服务，提供车票查询、车站搜索、中转查询等功能"
-                    },
-                    "capabilities": {
-                        "tools": {}
-                    }
-                }
-            }
-            
-            # Return response with Mcp-Session-Id header
-            logger.info(f"Initialize response sent - Protocol: {accepted_version}, Session: {session_id}")
-            return JSONResponse(
-                response,
-                headers={
-                    "Mcp-Session-Id": session_id,
-                    "Access-Control-Allow-Origin": "*"
-                }
-            )
-        
-        # For all other methods, require session ID
-        session_id = request.headers.get("mcp-session-id")
-        if not session_id:
-            logger.error("Missing Mcp-Session-Id header for non-initialize request")
-            return JSONResponse(
-                {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "error": {
-                        "code": -32000,
-                        "message": "Bad Request: No valid session ID provided"
-                    }
-                },
-                status_code=400
-            )
-        
-        # Validate session exists
-        if session_id not in connected_clients:
-            logger.error(f"Invalid session ID: {session_id}")
-            return JSONResponse(
-                {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "error": {
-                        "code": -32000,
-                        "message": "Invalid session ID"
-                    }
-                },
-                status_code=404  # Use 404 for invalid session as per spec
-            )
-        
-        logger.info(f"Processing message for session: {session_id}")
-        
-        # Handle tool listing
-        if method == "tools/list":
-            logger.info("Tools list requested")
-            response = {
-                "jsonrpc": "2.0", 
-                "id": request_id,
-                "result": {
-                    "tools": MCP_TOOLS
-                }
-            }
-            return JSONResponse(response)
-        
-        # Handle tool execution
-        elif method == "tools/call":
-            tool_name = params.get("name")
-            arguments = params.get("arguments", {})
-            
-            if not tool_name:
-                raise HTTPException(status_code=400, detail="Tool name is required")
-            
-            logger.info(f"Executing tool: {tool_name}")
-            logger.info(f"Arguments: {arguments}")
-            
-            # Execute the appropriate tool
-            try:
-                # Map tool names with hyphens to underscores for internal functions
-                if tool_name == "query-tickets":
-                    content = await query_tickets_validated(arguments)
-                elif tool_name == "query-ticket-price":
-                    content = await query_ticket_price_validated(arguments)
-                elif tool_name == "search-stations":
-                    content = await search_stations_validated(arguments)
-                elif tool_name == "query-transfer":
-                    content = await query_transfer_validated(arguments)
-                elif tool_name == "get-train-route-stations":
-                    content = await get_train_route_stations_validated(arguments)
-                elif tool_name == "get-train-no-by-train-code":
-                    content = await get_train_no_by_train_code_validated(arguments)
-                elif tool_name == "get-current-time":
-                    content = await get_current_time_validated(arguments)
-                else:
-                    content = [{
-                        "type": "text", 
-                        "text": f"未知工具: {tool_name}"
-                    }]
-                
-                response = {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": {
-                        "content": content,
-                        "isError": False
-                    }
-                }
-                logger.info(f"Tool {tool_name} executed successfully")
-                
-            except Exception as tool_error:
-                logger.error(f"Tool execution error: {tool_error}")
-                response = {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": {
-                        "content": [{
-                            "type": "text",
-                            "text": f"工具执行失败: {str(tool_error)}"
-                        }],
-                        "isError": True
-                    }
-                }
-            
-            return JSONResponse(response)
-        
-        # Handle notifications (no response required)
-        elif method and method.startswith("notifications/"):
-            notification_type = method.replace("notifications/", "")
-            logger.info(f"Received notification: {notification_type}")
-            
-            # Process notification but don't send response
-            if notification_type == "initialized":
-                logger.info("Client initialized successfully - MCP handshake complete!")
-                # Mark session as fully initialized
-                if session_id in connected_clients:
-                    connected_clients[session_id]["initialized"] = True
-            
-            # Notifications should return 202 Accepted according to MCP spec
-            return Response(status_code=202)  # Accepted
-        
-        # Handle ping requests
-        elif method == "ping":
-            response = {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "result": {
-                    "timestamp": datetime.now().isoformat(),
-                    "status": "alive"
-                }
-            }
-            return JSONResponse(response)
-        
-        # Unknown method
-        else:
-            logger.warning(f"Unknown method: {method}")
-            error_response = {
-                "jsonrpc": "2.0",
-                "id": request_id,
-                "error": {
-                    "code": -32601,
-                    "message": "Method not found",
-                    "data": {"method": method}
-                }
-            }
-            return JSONResponse(error_response, status_code=404)
-            
-    except json.JSONDecodeError:
-        logger.error("Invalid JSON in request")
-        return JSONResponse(
-            {
-                "jsonrpc": "2.0",
-                "id": None,
-                "error": {
-                    "code": -32700,
-                    "message": "Parse error"
-                }
-            },
-            status_code=400
-        )
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
-        return JSONResponse(
-            {
-                "jsonrpc": "2.0", 
-                "id": request_id,
-                "error": {
-                    "code": -32603,
-                    "message": "Internal error",
-                    "data": {"error": str(e)}
-                }
-            },
-            status_code=500
-        )
-
-@app.delete("/mcp")
-async def mcp_endpoint_delete(request: Request):
-    """MCP Streamable HTTP Endpoint - DELETE for session termination"""
-    session_id = request.headers.get("mcp-session-id")
-    
-    if not session_id:
-        return JSONResponse(
-            {"error": "Missing Mcp-Session-Id header"},
-            status_code=400
-        )
-    
-    if session_id in connected_clients:
-        del connected_clients[session_id]
-        logger.info(f"Session terminated: {session_id}")
-        return Response(status_code=200)
-    else:
-        return JSONResponse(
-            {"error": "Invalid session ID"},
-            status_code=404
-        )
-
-# 车站名/三字码自动转换
-async def ensure_telecode(val):
-    if val.isalpha() and val.isupper() and len(val) == 3:
-        return val
-    code = await station_service.get_station_code(val)
-    return code
-
-# 解析票务字符串
-
-def parse_ticket_string(ticket_str, query):
-    parts = ticket_str.split('|')
-    if len(parts) < 35:
-        return None
-    return {
-        "train_no": parts[3],
-        "start_time": parts[8],
-        "arrive_time": parts[9],
-        "duration": parts[10],
-        "business_seat_num": parts[32] or "",
-        "first_class_num": parts[31] or "",
-        "second_class_num": parts[30] or "",
-        "advanced_soft_sleeper_num": parts[21] or "",
-        "soft_sleeper_num": parts[23] or "",
-        "dongwo_num": parts[33] or "",
-        "hard_sleeper_num": parts[28] or "",
-        "soft_seat_num": parts[24] or "",
-        "hard_seat_num": parts[29] or "",
-        "no_seat_num": parts[26] or "",
-        "from_station": query["from_station"],
-        "to_station": query["to_station"],
-        "train_date": query["train_date"]
-    }
-
-# 车站模糊搜索工具
-async def search_stations_validated(args: dict) -> list:
-    query = args.get("query", "").strip()
-    limit = args.get("limit", 10)
-    if not query:
-        return [{"type": "text", "text": json.dumps({"success": False, "error": "请输入搜索关键词"}, ensure_ascii=False)}]
-    if not isinstance(limit, int) or limit < 1 or limit > 50:
-        limit = 10
-    result = await station_service.search_stations(query, limit)
-    if result.stations:
-        stations_data = []
-        for station in result.stations:
-            station_dict = {
-                "name": station.name,
-                "code": station.code,
-                "pinyin": station.pinyin,
-                "py_short": station.py_short if station.py_short else "",
-            }
-            if hasattr(station, 'num') and station.num:
-                station_dict["num"] = station.num
-            stations_data.append(station_dict)
-        
-        response_data = {
-            "success": True,
-            "query": query,
-            "count": len(stations_data),
-            "stations": stations_data
-        }
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-    else:
-        response_data = {
-            "success": False,
-            "query": query,
-            "count": 0,
-            "stations": [],
-            "message": "未找到匹配的车站",
-            "suggestions": [
-                "尝试完整城市名称 (如: 北京)",
-                "尝试拼音 (如: beijing)",
-                "尝试简拼 (如: bj)",
-                "检查拼写是否正确"
-            ]
-        }
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-
-# ========== query_tickets_validated 重构 ========== 
-async def query_tickets_validated(args: dict) -> list:
-    try:
-        from_station = args.get("from_station", "").strip()
-        to_station = args.get("to_station", "").strip()
-        train_date = args.get("train_date", "").strip()
-        logger.info(f"查询参数: {from_station} -> {to_station} ({train_date})")
-        errors = []
-        if not from_station:
-            errors.append("出发站不能为空")
-        if not to_station:
-            errors.append("到达站不能为空")
-        if not train_date:
-            errors.append("出发日期不能为空")
-        elif not validate_date(train_date):
-            errors.append("日期格式错误，请使用 YYYY-MM-DD 格式")
-        else:
-            # 检查日期是否早于今天
-            is_valid, error_msg = validate_date_not_past(train_date)
-            if not is_valid:
-                errors.append(error_msg)
-        
-        if errors:
-            response_data = {"success": False, "errors": errors}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        from_code = await ensure_telecode(from_station)
-        to_code = await ensure_telecode(to_station)
-        if not from_code or not to_code:
-            suggestions = []
-            if not from_code:
-                result = await station_service.search_stations(from_station, 3)
-                if result.stations:
-                    suggestions.append({"station_type": "from", "input": from_station, "matches": [{"name": s.name, "code": s.code, "pinyin": s.pinyin, "py_short": s.py_short} for s in result.stations]})
-            if not to_code:
-                result = await station_service.search_stations(to_station, 3)
-                if result.stations:
-                    suggestions.append({"station_type": "to", "input": to_station, "matches": [{"name": s.name, "code": s.code, "pinyin": s.pinyin, "py_short": s.py_short} for s in result.stations]})
-            response_data = {"success": False, "error": "车站名称无效", "suggestions": suggestions, "hint": "可尝试拼音、简拼、三字码或用 search_stations 工具辅助查询"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        
-        import httpx
-        url_init = HTTP_URLS["init"]
-        url_u = HTTP_URLS["query_left_ticket"]
-        headers = HTTP_HEADERS.copy()
-        max_retries = 3
-        last_exception = None
-        tickets_data = []
-
-        for attempt in range(max_retries):
-            try:
-                async with httpx.AsyncClient(follow_redirects=False, timeout=8, verify=False) as client:
-                    await client.get(url_init, headers=headers)
-                    params = {
-                        "leftTicketDTO.train_date": train_date,
-                        "leftTicketDTO.from_station": from_code,
-                        "leftTicketDTO.to_station": to_code,
-                        "purpose_codes": "ADULT"
-                    }
-                    resp = await client.get(url_u, headers=headers, params=params)
-                    logger.info(f"12306 queryG status: {resp.status_code}, url: {resp.url}")
-                    if resp.status_code != 200:
-                        logger.error(f"12306接口返回异常: {resp.status_code}, body: {resp.text}")
-                        response_data = {"success": False, "error": "12306接口返回异常", "status_code": resp.status_code, "detail": resp.text[:200]}
-                        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-                    try:
-                        data = resp.json().get("data", {})
-                        tickets_data = data.get("result", [])
-                        break  # Success
-                    except Exception as e:
-                        logger.error(f"12306响应解析失败: {repr(e)}，原始内容: {resp.text}")
-                        response_data = {"success": False, "error": "12306响应解析失败", "detail": f"{type(e).__name__}: {str(e)}"}
-                        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-            except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
-                last_exception = e
-                if attempt < max_retries - 1:
-                    logger.warning(f"查询车票网络请求失败，正在重试 ({attempt + 1}/{max_retries}): {str(e)}")
-                    await asyncio.sleep(1)
-                else:
-                    logger.error(f"查询车票网络请求重试次数已耗尽: {str(e)}")
-        else:
-            response_data = {"success": False, "error": f"网络请求失败 (已重试{max_retries}次): {str(last_exception)}"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        tickets = []
-        for ticket_str in tickets_data:
-            ticket = parse_ticket_string(ticket_str, {
-                "from_station": from_station,
-                "to_station": to_station,
-                "train_date": train_date
-            })
-            if ticket:
-                tickets.append(ticket)
-        if tickets:
-            trains_list = []
-            for i, ticket in enumerate(tickets, 1):
-                ticket_str = tickets_data[i-1] if i-1 < len(tickets_data) else None
-                from_station_name = to_station_name = from_code_actual = to_code_actual = None
-                if ticket_str:
-                    parts = ticket_str.split('|')
-                    from_code_actual = parts[6] if len(parts) > 6 else None
-                    to_code_actual = parts[7] if len(parts) > 7 else None
-                    from_station_obj = await station_service.get_station_by_code(from_code_actual) if from_code_actual else None
-                    to_station_obj = await station_service.get_station_by_code(to_code_actual) if to_code_actual else None
-                    from_station_name = from_station_obj.name if from_station_obj else (from_code_actual or "未知")
-                    to_station_name = to_station_obj.name if to_station_obj else (to_code_actual or "未知")
-                
-                seats = {}
-                if ticket['business_seat_num']: seats["business"] = ticket['business_seat_num']
-                if ticket['first_class_num']: seats["first_class"] = ticket['first_class_num']
-                if ticket['second_class_num']: seats["second_class"] = ticket['second_class_num']
-                if ticket['advanced_soft_sleeper_num']: seats["advanced_soft_sleeper"] = ticket['advanced_soft_sleeper_num']
-                if ticket['soft_sleeper_num']: seats["soft_sleeper"] = ticket['soft_sleeper_num']
-                if ticket['hard_sleeper_num']: seats["hard_sleeper"] = ticket['hard_sleeper_num']
-                if ticket['soft_seat_num']: seats["soft_seat"] = ticket['soft_seat_num']
-                if ticket['hard_seat_num']: seats["hard_seat"] = ticket['hard_seat_num']
-                if ticket['no_seat_num']: seats["no_seat"] = ticket['no_seat_num']
-                if ticket['dongwo_num']: seats["dongwo"] = ticket['dongwo_num']
-                
-                train_data = {
-                    "train_no": ticket['train_no'],
-                    "from_station": from_station_name,
-                    "from_station_code": from_code_actual,
-                    "to_station": to_station_name,
-                    "to_station_code": to_code_actual,
-                    "start_time": ticket['start_time'],
-                    "arrive_time": ticket['arrive_time'],
-                    "duration": ticket['duration'],
-                    "seats": seats
-                }
-                trains_list.append(train_data)
-            
-            response_data = {
-                "success": True,
-                "from_station": from_station,
-                "to_station": to_station,
-                "train_date": train_date,
-                "count": len(trains_list),
-                "trains": trains_list
-            }
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        else:
-            response_data = {
-                "success": False,
-                "from_station": from_station,
-                "to_station": to_station,
-                "train_date": train_date,
-                "count": 0,
-                "trains": [],
-                "message": "未找到该线路的余票"
-            }
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-    except Exception as e:
-        import traceback
-        error_detail = f"{type(e).__name__}: {str(e)}"
-        logger.error(f"查询车票失败: {error_detail}\n{traceback.format_exc()}")
-        response_data = {"success": False, "error": "查询失败", "detail": error_detail}
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-
-# ========== get_train_no_by_train_code_validated 重构 ========== 
-async def get_train_no_by_train_code_validated(args: dict) -> list:
-    """
-    根据车次号、出发站、到达站、日期，查询唯一列车编号train_no。
-    只允许精确匹配，所有参数必须为全名或三字码。
-    直接请求 /otn/leftTicket/queryG。
-    """
-    train_code = args.get("train_code", "").strip().upper()
-    from_station = args.get("from_station", "").strip().upper()
-    to_station = args.get("to_station", "").strip().upper()
-    train_date = args.get("train_date", "").strip()
-    
-    # 日期校验 - 复用 validate_date_not_past 函数
-    is_valid, error_msg = validate_date_not_past(train_date)
-    if not is_valid:
-        response_data = {"success": False, "error": error_msg}
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-    
-    # 三字码转换 - 复用 ensure_telecode 函数
-    from_code = await ensure_telecode(from_station)
-    if not from_code:
-        response_data = {"success": False, "error": f"出发站无效或无法识别：{from_station}"}
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-    from_station = from_code
-    
-    to_code = await ensure_telecode(to_station)
-    if not to_code:
-        response_data = {"success": False, "error": f"到达站无效或无法识别：{to_station}"}
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-    to_station = to_code
-    
-    # HTTP 请求 - 复用全局 headers 定义
-    url_init = HTTP_URLS["init"]
-    url_u = HTTP_URLS["query_left_ticket"]
-    headers = HTTP_HEADERS.copy()
-    
-    async with httpx.AsyncClient(follow_redirects=False, timeout=8, verify=False) as client:
-        await client.get(url_init, headers=headers)
-        params = {
-            "leftTicketDTO.train_date": train_date,
-            "leftTicketDTO.from_station": from_station,
-            "leftTicketDTO.to_station": to_station,
-            "purpose_codes": "ADULT"
-        }
-        resp = await client.get(url_u, headers=headers, params=params)
-        try:
-            data = resp.json().get("data", {})
-            tickets_data = data.get("result", [])
-        except Exception:
-            response_data = {"success": False, "error": "12306反爬拦截或数据异常，请稍后重试"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-    
-    if not tickets_data:
-        response_data = {"success": False, "error": f"未找到该线路的余票数据（{from_station}->{to_station} {train_date}）"}
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-    
-    # 辅助函数：从 ticket_str 中解析车次号和列车编号
-    def extract_train_info(ticket_str):
-        """从车次字符串中提取车次号和列车编号"""
-        try:
-            parts = ticket_str.split('|')
-            idx = parts.index('预订')
-            return {
-                "train_no": parts[idx+1].strip(),
-                "train_code": parts[idx+2].strip().upper()
-            }
-        except Exception:
-            return None
-    
-    # 查找匹配的车次
-    found = None
-    for ticket_str in tickets_data:
-        info = extract_train_info(ticket_str)
-        if info and info["train_code"] == train_code:
-            found = info["train_no"]
-            break
-    
-    if not found:
-        # 收集所有可用的车次号用于调试
-        debug_codes = []
-        for ticket_str in tickets_data:
-            info = extract_train_info(ticket_str)
-            if info:
-                debug_codes.append(info["train_code"])
-        
-        response_data = {
-            "success": False,
-            "train_code": train_code,
-            "from_station": from_station,
-            "to_station": to_station,
-            "train_date": train_date,
-            "error": "未找到该车次号的列车编号",
-            "available_trains": debug_codes
-        }
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-    
-    response_data = {
-        "success": True,
-        "train_code": train_code,
-        "train_no": found,
-        "from_station": from_station,
-        "to_station": to_station,
-        "train_date": train_date
-    }
-    return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-
-# ========== get_train_route_stations_validated 函数实现 ==========
-async def get_train_route_stations_validated(args: dict) -> list:
-    """
-    查询指定车次的所有经停站及时刻信息。
-    参数: train_no(列车编号或车次号), from_station(出发站), to_station(到达站), train_date(日期)
-    自动检测输入是车次号还是列车编号，如果是车次号则先转换为列车编号。
-    """
-    try:
-        train_no = args.get("train_no", "").strip()
-        from_station = args.get("from_station", "").strip().upper()
-        to_station = args.get("to_station", "").strip().upper()
-        train_date = args.get("train_date", "").strip()
-        
-        # 参数校验
-        if not train_no:
-            response_data = {"success": False, "error": "车次编号(train_no)不能为空"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        if not from_station:
-            response_data = {"success": False, "error": "出发站不能为空"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        if not to_station:
-            response_data = {"success": False, "error": "到达站不能为空"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        if not train_date:
-            response_data = {"success": False, "error": "出发日期不能为空"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        
-        # 日期格式校验和早于今天的校验
-        is_valid, error_msg = validate_date_not_past(train_date)
-        if not is_valid:
-            response_data = {"success": False, "error": error_msg}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        
-        # 三字码转换
-        def is_telecode(val):
-            return val.isalpha() and val.isupper() and len(val) == 3
-        
-        if not is_telecode(from_station):
-            code = await station_service.get_station_code(from_station)
-            if not code:
-                response_data = {"success": False, "error": f"出发站无效或无法识别：{from_station}"}
-                return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-            from_station = code
-        
-        if not is_telecode(to_station):
-            code = await station_service.get_station_code(to_station)
-            if not code:
-                response_data = {"success": False, "error": f"到达站无效或无法识别：{to_station}"}
-                return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-            to_station = code
-        
-        # 检测输入是车次号还是列车编号
-        # 列车编号格式通常为: 5700xxx或类似的长数字+字母格式（如：57000C95690L）
-        # 车次号格式通常为: 字母+数字（如：C9569、G1234、T456）
-        import re
-        is_train_code = bool(re.match(r'^[A-Z]+\d+$', train_no))
-        
-        if is_train_code:
-            # 输入的是车次号，需要先转换为列车编号
-            logger.info(f"检测到车次号 {train_no}，正在转换为列车编号...")
-            convert_args = {
-                "train_code": train_no,
-                "from_station": from_station,
-                "to_station": to_station,
-                "train_date": train_date
-            }
-            convert_result = await get_train_no_by_train_code_validated(convert_args)
-            
-            if not convert_result or not convert_result[0].get("text"):
-                response_data = {"success": False, "error": f"无法获取车次 {train_no} 的列车编号"}
-                return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-            
-            result_json_str = convert_result[0].get("text", "{}")
-            result_data = json.loads(result_json_str)
-            if not result_data.get("success"):
-                return convert_result  # 返回错误信息
-            
-            actual_train_no = result_data.get("train_no")
-            if not actual_train_no:
-                response_data = {"success": False, "error": f"无法解析车次 {train_no} 的列车编号"}
-                return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-            logger.info(f"车次 {train_no} 转换为列车编号: {actual_train_no}")
-        else:
-            # 输入的是列车编号，直接使用
-            actual_train_no = train_no
-            logger.info(f"使用列车编号: {actual_train_no}")
-        
-        # 调用12306经停站接口 - 使用正确的API端点
-        url = HTTP_URLS["query_route_stations"]
-        params = {
-            "train_no": actual_train_no,  # 使用转换后的列车编号
-            "from_station_telecode": from_station,
-            "to_station_telecode": to_station,
-            "depart_date": train_date
-        }
-        
-        # 使用与参考实现相同的请求方式
-        headers = HTTP_HEADERS.copy()
-        
-        max_retries = 3
-        last_exception = None
-        json_data = None
-
-        for attempt in range(max_retries):
-            try:
-                async with httpx.AsyncClient(follow_redirects=False, timeout=8, verify=False) as client:
-                    # 先访问init获取cookie
-                    init_resp = await client.get("https://kyfw.12306.cn/otn/leftTicket/init", headers=headers)
-                    logger.info(f"12306 init status: {init_resp.status_code}")
-                    
-                    resp = await client.get(url, headers=headers, params=params)
-                    logger.info(f"12306 route query status: {resp.status_code}, url: {resp.url}")
-                    
-                    # 检查HTTP状态码
-                    if resp.status_code != 200:
-                        logger.error(f"12306接口返回异常状态码: {resp.status_code}, body: {resp.text}")
-                        response_data = {"success": False, "error": f"12306接口返回异常: {resp.status_code}"}
-                        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-                    
-                    # 检查是否被重定向到错误页面
-                    if "error.html" in str(resp.url) or "ntce" in str(resp.url):
-                        response_data = {"success": False, "error": "12306反爬虫拦截，请稍后重试或更换网络环境"}
-                        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-                    
-                    try:
-                        json_data = resp.json()
-                        logger.info(f"12306 response keys: {list(json_data.keys()) if json_data else 'None'}")
-                        break # Success
-                    except Exception as e:
-                        logger.error(f"12306响应解析失败: {str(e)}, body: {resp.text}")
-                        response_data = {"success": False, "error": f"12306响应解析失败: {str(e)}"}
-                        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-            except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
-                last_exception = e
-                if attempt < max_retries - 1:
-                    logger.warning(f"查询经停站网络请求失败，正在重试 ({attempt + 1}/{max_retries}): {str(e)}")
-                    await asyncio.sleep(1)
-                else:
-                    logger.error(f"查询经停站网络请求重试次数已耗尽: {str(e)}")
-        else:
-            response_data = {"success": False, "error": f"网络请求失败 (已重试{max_retries}次): {str(last_exception)}"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        
-        if not json_data:
-            response_data = {"success": False, "error": "12306接口返回空数据"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        
-        # 解析经停站数据 - 使用与参考实现相同的数据结构解析
-        data = json_data.get("data", {})
-        stations = data.get("data", [])
-        
-        # 兼容官方经停站接口返回的多种数据结构
-        if not stations and "middleList" in data:
-            stations = []
-            for m in data["middleList"]:
-                if "fullList" in m:
-                    stations.extend(m["fullList"])
-        if not stations and "fullList" in data:
-            stations = data["fullList"]
-        if not stations and "route" in data:
-            stations = data["route"]
-        
-        if not stations:
-            response_data = {"success": False, "train_no": train_no, "error": "未找到经停站信息"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        
-        # 格式化输出JSON
-        stations_list = []
-        for station in stations:
-            station_data = {
-                "station_no": station.get("station_no", station.get("from_station_no", "")),
-                "station_name": station.get("station_name", station.get("from_station_name", "")),
-                "arrive_time": station.get("arrive_time", "----"),
-                "start_time": station.get("start_time", "----"),
-                "stopover_time": station.get("stopover_time", "----")
-            }
-            stations_list.append(station_data)
-        
-        response_data = {
-            "success": True,
-            "train_no": train_no,
-            "train_date": train_date,
-            "count": len(stations_list),
-            "stations": stations_list
-        }
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        
-    except Exception as e:
-        logger.error(f"查询经停站失败: {repr(e)}")
-        response_data = {"success": False, "error": "查询经停站失败", "detail": str(e)}
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-
-# ========== query_transfer_validated 函数实现 ==========
-async def query_transfer_validated(args: dict) -> list:
-    """
-    查询中转换乘方案。使用参考代码的正确实现方式。
-    支持指定中转站、学生票、无座车次等选项，自动分页获取所有中转方案。
-    """
-    try:
-        from_station = args.get("from_station", "").strip()
-        to_station = args.get("to_station", "").strip()
-        train_date = args.get("train_date", "").strip()
-        middle_station = args.get("middle_station", "").strip() if "middle_station" in args else ""
-        isShowWZ = args.get("isShowWZ", "N").strip().upper() or "N"
-        purpose_codes = args.get("purpose_codes", "00").strip().upper() or "00"
-        
-        # 参数校验
-        if not from_station or not to_station or not train_date:
-            response_data = {"success": False, "error": "请输入出发站、到达站和出发日期"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        
-        # 日期格式校验和早于今天的校验
-        is_valid, error_msg = validate_date_not_past(train_date)
-        if not is_valid:
-            response_data = {"success": False, "error": error_msg}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        
-        # 自动转三字码 - 使用参考代码的实现
-        async def ensure_telecode(val):
-            if val.isalpha() and val.isupper() and len(val) == 3:
-                return val
-            code = await station_service.get_station_code(val)
-            return code
-        
-        from_code = await ensure_telecode(from_station)
-        to_code = await ensure_telecode(to_station)
-        if not from_code:
-            response_data = {"success": False, "error": f"出发站无效或无法识别：{from_station}"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        if not to_code:
-            response_data = {"success": False, "error": f"到达站无效或无法识别：{to_station}"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-
-        # 处理中转站：如果是中文名称，尝试转换为三字码
-        middle_station_code = ""
-        if middle_station:
-            middle_station_code = await ensure_telecode(middle_station)
-            if not middle_station_code:
-                # 如果转换失败，记录日志但继续尝试使用原值（虽然很可能失败）
-                logger.warning(f"无法识别中转站: {middle_station}")
-                middle_station_code = middle_station 
-        
-        # 使用中转查询专用接口
-        url_init = HTTP_URLS["init"]
-        url = HTTP_URLS["query_transfer"]
-        headers = HTTP_HEADERS.copy()
-        
-        all_transfer_list = []
-        max_retries = 3
-        last_exception = None
-
-        for attempt in range(max_retries):
-            try:
-                async with httpx.AsyncClient(follow_redirects=False, timeout=8, verify=False) as client:
-                    # 先访问init获取cookie
-                    await client.get(url_init, headers=headers)
-                    
-                    # 分页查询所有中转方案
-                    page_size = 10
-                    result_index = 0
-                    page_num = 1
-                    
-                    while True:
-                        params = {
-                            "train_date": train_date,
-                            "from_station_telecode": from_code,
-                            "to_station_telecode": to_code,
-                            "middle_station": middle_station_code,
-                            "result_index": str(result_index),
-                            "can_query": "Y",
-                            "isShowWZ": isShowWZ,
-                            "purpose_codes": purpose_codes,
-                            "channel": "E"
-                        }
-                        
-                        resp = await client.get(url, headers=headers, params=params)
-                        
-                        # 检查反爬虫
-                        if resp.status_code == 302 or "error.html" in str(resp.headers.get("location", "")):
-                            if page_num == 1:
-                                response_data = {"success": False, "error": "12306反爬虫拦截（302跳转），请稍后重试或更换网络环境"}
-                                return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-                            else:
-                                break
-                        
-                        try:
-                            data = resp.json().get("data", {})
-                            transfer_list = data.get("middleList", [])
-                        except Exception:
-                            if page_num == 1:
-                                response_data = {"success": False, "error": "12306反爬拦截或数据异常，请稍后重试"}
-                                return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-                            else:
-                                break
-                        
-                        if not transfer_list:
-                            break
-                        
-                        all_transfer_list.extend(transfer_list)
-                        
-                        # 如果返回的数据少于页面大小，说明已经是最后一页
-                        if len(transfer_list) < page_size:
-                            break
-                        
-                        result_index += page_size
-                        page_num += 1
-                    
-                    # Success
-                    break
-            except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
-                last_exception = e
-                # 清空可能已获取的部分数据，准备重试
-                all_transfer_list = []
-                if attempt < max_retries - 1:
-                    logger.warning(f"中转查询网络请求失败，正在重试 ({attempt + 1}/{max_retries}): {str(e)}")
-                    await asyncio.sleep(1)
-                else:
-                    logger.error(f"中转查询网络请求重试次数已耗尽: {str(e)}")
-        else:
-            response_data = {"success": False, "error": f"网络请求失败 (已重试{max_retries}次): {str(last_exception)}"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        
-        if not all_transfer_list:
-            response_data = {
-                "success": False,
-                "from_station": from_station,
-                "to_station": to_station,
-                "train_date": train_date,
-                "count": 0,
-                "transfers": [],
-                "message": "未查到中转方案"
-            }
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        
-        # 构建JSON格式的中转方案数据
-        transfers_list = []
-        for item in all_transfer_list:
-            try:
-                # 优先用 fullList，降级用 trainList
-                full_list = item.get("fullList") or item.get("trainList") or []
-                if len(full_list) < 2:
-                    continue
-                
-                # 解析每段车次
-                segments = []
-                for seg in full_list:
-                    # 座位余票信息 - 只包含有票的座位类型
-                    seats = {}
-                    seat_num = seg.get("swz_num", "")
-                    if seat_num and seat_num != "--" and seat_num != "":
-                        seats["商务座"] = seat_num
-                    seat_num = seg.get("tz_num", "")
-                    if seat_num and seat_num != "--" and seat_num != "":
-                        seats["特等座"] = seat_num
-                    seat_num = seg.get("zy_num", "")
-                    if seat_num and seat_num != "--" and seat_num != "":
-                        seats["一等座"] = seat_num
-                    seat_num = seg.get("ze_num", "")
-                    if seat_num and seat_num != "--" and seat_num != "":
-                        seats["二等座"] = seat_num
-                    seat_num = seg.get("gr_num", "")
-                    if seat_num and seat_num != "--" and seat_num != "":
-                        seats["高级软卧"] = seat_num
-                    seat_num = seg.get("rw_num", "")
-                    if seat_num and seat_num != "--" and seat_num != "":
-                        seats["软卧"] = seat_num
-                    seat_num = seg.get("rz_num", "")
-                    if seat_num and seat_num != "--" and seat_num != "":
-                        seats["一等卧"] = seat_num
-                    seat_num = seg.get("yw_num", "")
-                    if seat_num and seat_num != "--" and seat_num != "":
-                        seats["硬卧"] = seat_num
-                    seat_num = seg.get("yz_num", "")
-                    if seat_num and seat_num != "--" and seat_num != "":
-                        seats["硬座"] = seat_num
-                    seat_num = seg.get("wz_num", "")
-                    if seat_num and seat_num != "--" and seat_num != "":
-                        seats["无座"] = seat_num
-                    
-                    segment_data = {
-                        "train_code": seg.get("station_train_code", ""),
-                        "from_station": seg.get("from_station_name", ""),
-                        "to_station": seg.get("to_station_name", ""),
-                        "start_time": seg.get("start_time", ""),
-                        "arrive_time": seg.get("arrive_time", ""),
-                        "duration": seg.get("lishi", ""),
-                        "seats": seats
-                    }
-                    segments.append(segment_data)
-                
-                transfer_data = {
-                    "middle_station": item.get("middle_station_name") or (full_list[0].get("to_station_name", "") if full_list else ""),
-                    "wait_time": item.get("wait_time", ""),
-                    "total_duration": item.get("all_lishi", ""),
-                    "segments": segments
-                }
-                transfers_list.append(transfer_data)
-                
-            except Exception as e:
-                logger.warning(f"解析中转方案失败: {e}")
-                continue
-        
-        response_data = {
-            "success": True,
-            "from_station": from_station,
-            "to_station": to_station,
-            "train_date": train_date,
-            "count": len(transfers_list),
-            "transfers": transfers_list
-        }
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        
-    except Exception as e:
-        logger.error(f"查询中转失败: {repr(e)}")
-        response_data = {"success": False, "error": "查询中转失败", "detail": str(e)}
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-
-
-# ========== query_ticket_price_validated 函数实现 ==========
-async def query_ticket_price_validated(args: dict) -> list:
-    """
-    查询火车票价信息
-    """
-    try:
-        from_station = args.get("from_station", "").strip()
-        to_station = args.get("to_station", "").strip()
-        train_date = args.get("train_date", "").strip()
-        purpose_codes = args.get("purpose_codes", "ADULT").strip()
-        train_code = args.get("train_code", "").strip().upper()
-        
-        # 参数校验
-        if not from_station or not to_station or not train_date:
-            response_data = {"success": False, "error": "请输入出发站、到达站和出发日期"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-            
-        # 日期格式校验和早于今天的校验
-        is_valid, error_msg = validate_date_not_past(train_date)
-        if not is_valid:
-            response_data = {"success": False, "error": error_msg}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-
-        # 转换三字码
-        async def ensure_telecode(val):
-            if val.isalpha() and val.isupper() and len(val) == 3:
-                return val
-            code = await station_service.get_station_code(val)
-            return code
-
-        from_code = await ensure_telecode(from_station)
-        to_code = await ensure_telecode(to_station)
-        
-        if not from_code:
-             response_data = {"success": False, "error": f"出发站无效: {from_station}"}
-             return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-        if not to_code:
-             response_data = {"success": False, "error": f"到达站无效: {to_station}"}
-             return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-
-        import httpx
-        url_init = HTTP_URLS["init"]
-        url_price = HTTP_URLS["query_price"]
-        headers = HTTP_HEADERS.copy()
-        
-        params = {
-            "leftTicketDTO.train_date": train_date,
-            "leftTicketDTO.from_station": from_code,
-            "leftTicketDTO.to_station": to_code,
-            "purpose_codes": purpose_codes
-        }
-
-        max_retries = 3
-        last_exception = None
-        json_data = None
-
-        for attempt in range(max_retries):
-            try:
-                async with httpx.AsyncClient(follow_redirects=False, timeout=8, verify=False) as client:
-                    await client.get(url_init, headers=headers)
-                    resp = await client.get(url_price, headers=headers, params=params)
-                    logger.info(f"12306 price query status: {resp.status_code}, url: {resp.url}")
-                    
-                    if resp.status_code != 200:
-                         logger.error(f"12306接口返回异常: {resp.status_code}")
-                         response_data = {"success": False, "error": f"12306接口返回异常: {resp.status_code}"}
-                         return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-                    
-                    try:
-                        json_data = resp.json()
-                        break
-                    except Exception as e:
-                        logger.error(f"12306响应解析失败: {str(e)}")
-                        response_data = {"success": False, "error": "12306响应解析失败", "detail": str(e)}
-                        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-            except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
-                last_exception = e
-                if attempt < max_retries - 1:
-                    logger.warning(f"票价查询网络请求失败，正在重试 ({attempt + 1}/{max_retries}): {str(e)}")
-                    await asyncio.sleep(1)
-                else:
-                    logger.error(f"票价查询网络请求重试次数已耗尽: {str(e)}")
-        else:
-            response_data = {"success": False, "error": f"网络请求失败 (已重试{max_retries}次): {str(last_exception)}"}
-            return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-
-        # 解析票价信息
-        if json_data and "data" in json_data:
-            result_data = []
-            price_map = {
-                "wz_price": "无座",
-                "yz_price": "硬座",
-                "yw_price": "硬卧",
-                "rw_price": "软卧",
-                "gr_price": "高级软卧",
-                "ze_price": "二等座",
-                "zy_price": "一等座",
-                "swz_price": "商务座",
-                "tdz_price": "特等座",
-                "dw_price": "动卧"
-            }
-            
-            for item in json_data.get("data", []):
-                query_left_new_dto = item.get("queryLeftNewDTO", {})
-                
-                # 如果指定了车次号，进行过滤
-                current_train_code = query_left_new_dto.get("station_train_code", "")
-                if train_code and current_train_code != train_code:
-                    continue
-                
-                train_info = {
-                    "train_no": query_left_new_dto.get("train_no"),
-                    "train_code": current_train_code,
-                    "from_station": query_left_new_dto.get("from_station_name"),
-                    "to_station": query_left_new_dto.get("to_station_name"),
-                    "start_time": query_left_new_dto.get("start_time"),
-                    "arrive_time": query_left_new_dto.get("arrive_time"),
-                    "duration": query_left_new_dto.get("lishi"),
-                    "train_class_name": query_left_new_dto.get("train_class_name"),
-                    "prices": {}
-                }
-                
-                # 提取票价
-                for key, name in price_map.items():
-                    price_val = query_left_new_dto.get(key)
-                    if price_val and price_val != "--":
-                        try:
-                            # 12306返回的价格最后一位是角，例如"00230"表示23.0元
-                            if price_val.isdigit():
-                                price_int = int(price_val)
-                                # 插入小数点
-                                price_str = str(price_int)
-                                if len(price_str) == 1:
-                                    formatted_price = "0." + price_str
-                                else:
-                                    formatted_price = price_str[:-1] + "." + price_str[-1]
-                                train_info["prices"][name] = formatted_price
-                            else:
-                                train_info["prices"][name] = price_val
-                        except:
-                            train_info["prices"][name] = price_val
-                            
-                result_data.append(train_info)
-            
-            final_response = {
-                "success": True,
-                "from_station": from_station,
-                "to_station": to_station,
-                "train_date": train_date,
-                "count": len(result_data),
-                "data": result_data
-            }
-            return [{"type": "text", "text": json.dumps(final_response, ensure_ascii=False)}]
-
-        return [{"type": "text", "text": json.dumps(json_data, ensure_ascii=False)}]
-        
-    except Exception as e:
-        logger.error(f"查询票价失败: {repr(e)}")
-        response_data = {"success": False, "error": "查询票价失败", "detail": str(e)}
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-
-# ========== get_current_time_validated 新增时间工具 ==========
-async def get_current_time_validated(args: dict) -> list:
-    """
-    返回当前时间信息JSON格式
-    """
-    try:
-        from datetime import datetime
-        import pytz
-        timezone_str = args.get("timezone", "Asia/Shanghai")
-        date_format = args.get("format", "YYYY-MM-DD")
-        try:
-            tz = pytz.timezone(timezone_str)
-            now = datetime.now(tz)
-        except pytz.exceptions.UnknownTimeZoneError:
-            tz = pytz.timezone("Asia/Shanghai")
-            now = datetime.now(tz)
-        
-        response_data = {
-            "success": True,
-            "timezone": tz.zone,
-            "datetime": now.strftime("%Y-%m-%d %H:%M:%S"),
-            "date": now.strftime("%Y-%m-%d"),
-            "time": now.strftime("%H:%M:%S"),
-            "timestamp": int(now.timestamp())
-        }
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-    except Exception as e:
-        logger.error(f"获取时间信息失败: {repr(e)}")
-        response_data = {"success": False, "error": "获取时间信息失败", "detail": str(e)}
-        return [{"type": "text", "text": json.dumps(response_data, ensure_ascii=False)}]
-
-@app.on_event("startup")
-async def startup_event():
-    """应用启动时的初始化工作"""
-    logger.info("启动12306 MCP服务器...")
-    logger.info(f"协议版本: {MCP_PROTOCOL_VERSION}")
-    logger.info(f"传输类型: Streamable HTTP")
-    
-    # Load station data
-    logger.info("正在加载车站数据...")
-    await station_service.load_stations()
-    logger.info(f"已加载 {len(station_service.stations)} 个车站")
-
-async def main_server():
-    """启动MCP服务器"""
-    logger.info("启动12306 MCP服务器...")
-    logger.info(f"协议版本: {MCP_PROTOCOL_VERSION}")
-    logger.info(f"传输类型: Streamable HTTP")
-    logger.info(f"MCP端点: http://{settings.server_host}:{settings.server_port}/mcp")
-    logger.info(f"健康检查: http://{settings.server_host}:{settings.server_port}/health")
-    
-    config = uvicorn.Config(
-        app,
-        host=settings.server_host,
-        port=settings.server_port,
-        log_level=settings.log_level.lower()
-    )
-    uvicorn_server = uvicorn.Server(config)
-    await uvicorn_server.serve()
-
-def main():
-    asyncio.run(main_server())
-
-if __name__ == "__main__":
-    main()
+import asyncio
+import cachetools
+import functools
+import json
+import logging
+import operator
+import fastjsonschema
+import httpx
+import orjson
+import random
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Union
+import secrets
+import re
+import ssl
+import time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from fastapi.middleware.cors import CORSMiddleware
+from mcp.types import TextContent
+import uvicorn
+
+from .services.station_service import StationService
+from .utils.config import get_settings
+from .utils.date_utils import validate_date, validate_date_not_past
+from .utils.event_loop import run_event_loop
+from . import __version__
+
+settings = get_settings()
+
+logging.basicConfig(
+    level=getattr(logging, settings.log_level.upper(), logging.INFO),
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+station_service = StationService()
+
+
+class ORJSONResponse(JSONResponse):
+    """使用 orjson 序列化的 JSON 响应"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+# 服务器时间戳统一使用北京时间
+_TZ = ZoneInfo("Asia/Shanghai")
+
+
+@functools.lru_cache(maxsize=2)
+def _iso(sec: int) -> str:
+    return datetime.fromtimestamp(sec, _TZ).isoformat()
+
+
+def _now_iso() -> str:
+    """当前时间的 ISO 格式字符串，精确到秒，同一秒内复用格式化结果"""
+    return _iso(int(time.time()))
+
+
+def _dump(obj: Any) -> str:
+    """将工具结果序列化为 JSON 字符串（orjson 默认输出 UTF-8，不转义中文）"""
+    return orjson.dumps(obj).decode()
+
+
+def _text_result(obj: Any) -> List[TextContent]:
+    """将工具结果打包为 MCP 文本内容列表，stdio 模式可直接返回给 SDK"""
+    return [TextContent(type="text", text=_dump(obj))]
+
+
+# MCP Protocol Version - Support 2025-03-26 Streamable HTTP transport
+MCP_PROTOCOL_VERSION = "2025-03-26"  # Updated to latest protocol version
+SERVER_NAME = "mcp-server-12306"
+SERVER_VERSION = __version__
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/123.0.0.0 Safari/537.36"
+)
+
+# 中国铁路 12306 API 常量 - URL
+HTTP_URLS = {
+    "init": "https://kyfw.12306.cn/otn/leftTicket/init",
+    "query_left_ticket": "https://kyfw.12306.cn/otn/leftTicket/queryG",
+    "query_transfer": "https://kyfw.12306.cn/lcquery/queryG",
+    "query_price": "https://kyfw.12306.cn/otn/leftTicketPrice/queryAllPublicPrice",
+    "query_route_stations": "https://kyfw.12306.cn/otn/czxx/queryByTrainNo",
+}
+
+# 中国铁路 12306 API 通用请求头
+HTTP_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Referer": "https://kyfw.12306.cn/otn/leftTicket/init",
+    "Host": "kyfw.12306.cn",
+    "Accept": "application/json, text/javascript, */*; q=0.01",
+    "Accept-Language": "zh-CN,zh;q=0.9",
+    "X-Requested-With": "XMLHttpRequest",
+    "Origin": "https://kyfw.12306.cn"
+}
+
+# 12306 不校验证书（与 verify=False 等价），SSL 上下文只构建一次供所有客户端复用；
+# 不校验证书就无需加载系统 CA，直接构建空上下文，省去启动时读取证书库的开销
+_SSL_CTX = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+_SSL_CTX.check_hostname = False
+_SSL_CTX.verify_mode = ssl.CERT_NONE
+
+# 共享的 12306 HTTP 客户端，跨请求复用 TCP/TLS 连接；启用 HTTP/2 后并发请求在同一连接上多路复用
+# （HTTP/2 禁止 Connection 等逐跳请求头，连接保持由客户端自行管理）
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取共享的 12306 HTTP 客户端（首次调用时创建）"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            follow_redirects=False,
+            http2=True,
+            timeout=8,
+            verify=_SSL_CTX,
+            headers=HTTP_HEADERS,
+            limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=30)
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """关闭共享的 HTTP 客户端"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    _cookie_primed.clear()
+
+
+# 共享客户端的 cookie jar 在进程内持续有效，init 页面只需访问一次
+_cookie_primed = asyncio.Event()
+_cookie_lock = asyncio.Lock()
+
+
+async def _prime_cookies(client: httpx.AsyncClient):
+    """首次请求前访问 12306 init 页面获取 cookie，并发请求只会触发一次"""
+    if _cookie_primed.is_set():
+        return
+    async with _cookie_lock:
+        if _cookie_primed.is_set():
+            return
+        resp = await client.get(HTTP_URLS["init"])
+        logger.info(f"12306 init status: {resp.status_code}")
+        _cookie_primed.set()
+
+
+def _looks_like_json(content: bytes) -> bool:
+    """根据首个非空白字节粗略判断响应体是否为 JSON，只检查开头一小段，不复制整个响应体"""
+    return content[:64].lstrip()[:1] in (b"{", b"[")
+
+
+def _should_retry(exc: Exception, attempt: int, max_retries: int) -> bool:
+    """网络错误是否值得重试：连接建立失败（DNS/网络不可达）时重试通常无济于事，直接放弃"""
+    return attempt < max_retries - 1 and not isinstance(exc, httpx.ConnectError)
+
+
+def _backoff_delay(attempt: int) -> float:
+    """带随机抖动的指数退避时间，避免并发请求同时重试"""
+    return random.uniform(0.1, 0.3) * (2 ** attempt)
+
+
+async def _get_12306(client: httpx.AsyncClient, url: str, params: dict) -> httpx.Response:
+    """
+    带 cookie 请求 12306 接口。cookie 失效时 12306 会返回 302 重定向，或返回 200 的 HTML
+    页面等非 JSON 内容，此时重新获取 cookie 并重试一次
+    """
+    await _prime_cookies(client)
+    resp = await client.get(url, params=params)
+    if resp.status_code == 302 or not _looks_like_json(resp.content):
+        logger.info(f"12306 返回 {resp.status_code}（非 JSON 响应），重新获取 cookie 后重试")
+        _cookie_primed.clear()
+        await _prime_cookies(client)
+        resp = await client.get(url, params=params)
+    return resp
+
+# Connected clients for session management
+# 会话超过 1 小时无活动即过期，防止断开的 SSE 连接和只初始化不再访问的会话无限堆积
+SESSION_TTL = 3600
+MAX_SESSIONS = 10000
+connected_clients: cachetools.TTLCache = cachetools.TTLCache(maxsize=MAX_SESSIONS, ttl=SESSION_TTL)
+
+# SSE 心跳：由单个后台任务定时广播，所有 GET 连接等待同一个事件，而不是各自持有一个定时器
+PING_INTERVAL = 30
+_ping_event = asyncio.Event()
+_pinger_task: Optional[asyncio.Task] = None
+
+
+async def _pinger():
+    """每 PING_INTERVAL 秒唤醒一次所有 SSE 连接，并顺带清理过期会话"""
+    while True:
+        await asyncio.sleep(PING_INTERVAL)
+        connected_clients.expire()
+        # 没有任何会话时无需唤醒
+        if not connected_clients:
+            continue
+        _ping_event.set()
+        _ping_event.clear()
+
+# MCP Tools Definition according to spec
+MCP_TOOLS = [
+    {
+        "name": "query-tickets",
+        "description": "官方12306余票/车次/座席/时刻一站式查询。输入出发站、到达站、日期，返回所有可购车次、时刻、历时、各席别余票等详细信息。支持中文名、三字码。\n\n【智能筛选指南】返回结果通常包含出发/到达城市的所有相关车站（如北京/北京西/北京南）。请根据用户输入语境灵活处理：\n1. 用户仅输入城市名（如'九江'）：请展示所有相关站点的车次，不要过滤。\n2. 用户指定具体车站（如'九江站'）：优先展示匹配车站的车次，但若其他同城车站有更优方案（如时间更短、有票），也应作为补充选项提供。\n请避免机械地仅通过字符串匹配过滤车次，以免遗漏用户可能感兴趣的出行方案。",
+        "inputSchema": {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "object",
+            "title": "车票查询参数",
+            "description": "查询火车票所需的参数",
+            "properties": {
+                "from_station": {"type": "string", "title": "出发站", "description": "出发车站名称，例如：北京、上海、广州", "minLength": 1},
+                "to_station": {"type": "string", "title": "到达站", "description": "到达车站名称，例如：北京、上海、广州", "minLength": 1},
+                "train_date": {"type": "string", "title": "出发日期", "description": "出发日期，格式：YYYY-MM-DD", "pattern": "^\\d{4}-\\d{2}-\\d{2}$"}
+            },
+            "required": ["from_station", "to_station", "train_date"],
+            "additionalProperties": False
+        }
+    },
+    {
+        "name": "query-ticket-price",
+        "description": "查询火车票价信息。输入出发站、到达站、日期，返回各车次的票价详情。支持指定车次号过滤。\n\n【智能筛选指南】返回结果通常包含出发/到达城市的所有相关车站（如北京/北京西/北京南）。请根据用户输入语境灵活处理：\n1. 用户仅输入城市名（如'九江'）：请展示所有相关站点的车次，不要过滤。\n2. 用户指定具体车站（如'九江站'）：优先展示匹配车站的车次，但若其他同城车站有更优方案（如时间更短、有票），也应作为补充选项提供。\n请避免机械地仅通过字符串匹配过滤车次，以免遗漏用户可能感兴趣的出行方案。",
+        "inputSchema": {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "object",
+            "title": "票价查询参数",
+            "properties": {
+                "from_station": {"type": "string", "title": "出发站", "minLength": 1},
+                "to_station": {"type": "string", "title": "到达站", "minLength": 1},
+                "train_date": {"type": "string", "title": "出发日期", "pattern": "^\\d{4}-\\d{2}-\\d{2}$"},
+                "train_code": {"type": "string", "title": "车次号（可选）", "description": "指定车次号（如G123），若提供则只返回该车次信息"},
+                "purpose_codes": {"type": "string", "title": "乘客类型", "description": "ADULT=成人, 0X=学生", "default": "ADULT"}
+            },
+            "required": ["from_station", "to_station", "train_date"],
+            "additionalProperties": False
+        }
+    },
+    {
+        "name": "search-stations",
+        "description": "智能车站搜索。支持中文名、拼音、简拼、三字码（Code）。可用于模糊搜索（如“北京”），也可用于精确获取车站代码（如输入“BJP”返回北京站信息）。",
+        "inputSchema": {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "object",
+            "title": "车站搜索参数",
+            "description": "搜索火车站所需的参数",
+            "properties": {
+                "query": {"type": "string", "title": "搜索关键词", "description": "车站搜索关键词，支持：车站名称、拼音、简拼等", "minLength": 1, "maxLength": 20},
+                "limit": {"type": "integer", "title": "结果数量限制", "description": "返回结果的最大数量", "minimum": 1, "maximum": 50, "default": 10}
+            },
+            "required": ["query"],
+            "additionalProperties": False
+        }
+    },
+    {
+        "name": "query-transfer",
+        "description": "官方中转换乘方案查询。输入出发站、到达站、日期，可选中转站/无座/学生票，自动分页抓取全部中转方案，输出每段车次、时刻、余票、等候时间、总历时等详细信息。",
+        "inputSchema": {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "object",
+            "title": "中转查询参数",
+            "description": "查询A到B的中转换乘（含一次换乘）",
+            "properties": {
+                "from_station": {"type": "string", "title": "出发站"},
+                "to_station": {"type": "string", "title": "到达站"},
+                "train_date": {"type": "string", "title": "出发日期", "pattern": "^\\d{4}-\\d{2}-\\d{2}$"},
+                "middle_station": {"type": "string", "title": "中转站（可选）", "description": "指定中转站名称或三字码，可选"},
+                "isShowWZ": {"type": "string", "title": "是否显示无座车次（Y/N）", "description": "Y=显示无座车次，N=不显示，默认N", "default": "N"},
+                "purpose_codes": {"type": "string", "title": "乘客类型（00=普通，0X=学生）", "description": "00为普通，0X为学生，默认00"}
+            },
+            "required": ["from_station", "to_station", "train_date"],
+            "additionalProperties": False
+        }
+    },
+    {
+        "name": "get-train-route-stations",
+        "description": "列车经停站全表查询。支持输入车次号或官方编号，自动转换，返回所有经停站、到发时刻、停留时间。支持三字码/全名。",
+        "inputSchema": {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "object",
+            "title": "列车经停站查询参数",
+            "properties": {
+                "train_no": {"type": "string", "title": "车次编码", "minLength": 1},
+                "from_station": {"type": "string", "title": "出发站id", "minLength": 1},
+                "to_station": {"type": "string", "title": "到达站id", "minLength": 1},
+                "train_date": {"type": "string", "title": "出发日期", "pattern": "^\\d{4}-\\d{2}-\\d{2}$"}
+            },
+            "required": ["train_no", "from_station", "to_station", "train_date"],
+            "additionalProperties": False
+        }
+    },
+    {
+        "name": "get-train-no-by-train-code",
+        "description": "车次号转官方唯一编号（train_no），支持三字码/全名。常用于经停站查询前置转换。",
+        "inputSchema": {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "object",
+            "title": "车次号转编号参数",
+            "properties": {
+                "train_code": {"type": "string", "title": "车次号", "minLength": 1},
+                "from_station": {"type": "string", "title": "出发站id或全名", "minLength": 1},
+                "to_station": {"type": "string", "title": "到达站id或全名", "minLength": 1},
+                "train_date": {"type": "string", "title": "出发日期", "pattern": "^\\d{4}-\\d{2}-\\d{2}$"}
+            },            "required": ["train_code", "from_station", "to_station", "train_date"],
+            "additionalProperties": False
+        }
+    },
+    {
+        "name": "get-current-time",
+        "description": "获取当前日期和时间信息，支持相对日期计算。返回当前日期、时间，以及常用的相对日期（明天、后天等），方便用户在查询火车票时选择正确的日期。",
+        "inputSchema": {
+            "$schema": "http://json-schema.org/draft-07/schema#",
+            "type": "object",
+            "title": "获取当前时间参数",
+            "description": "获取当前时间和日期信息",
+            "properties": {
+                "timezone": {"type": "string", "title": "时区", "description": "时区设置，默认为中国时区", "default": "Asia/Shanghai"},
+                "format": {"type": "string", "title": "日期格式", "description": "返回的日期格式，默认为YYYY-MM-DD", "default": "YYYY-MM-DD"}
+            },
+            "additionalProperties": False
+        }
+    }
+]
+
+# 预编译各工具 inputSchema 的参数校验器（不填充默认值，默认值由各工具函数自行处理）
+_VALIDATORS = {
+    tool["name"]: fastjsonschema.compile(tool["inputSchema"], use_default=False)
+    for tool in MCP_TOOLS
+}
+
+# tools/list 的结果在运行期间不变，启动时预先序列化
+_TOOLS_LIST_RESULT_BYTES = orjson.dumps({"tools": MCP_TOOLS})
+
+# ping 响应只有 id 和时间戳不同，直接按模板拼接
+_PING_TEMPLATE = b'{"jsonrpc":"2.0","id":%s,"result":{"timestamp":"%s","status":"alive"}}'
+
+app = FastAPI(
+    title=SERVER_NAME,
+    version=SERVER_VERSION,
+    description=f"基于MCP协议(2025-03-26 Streamable HTTP)的12306火车票查询服务，支持直达、过站和换乘查询",
+    debug=settings.debug,
+    default_response_class=ORJSONResponse
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"]
+)
+
+@app.get("/")
+async def root():
+    return {
+        "name": SERVER_NAME,
+        "version": SERVER_VERSION,
+        "status": "running",
+        "mcp_endpoint": "/mcp",
+        "protocol_version": MCP_PROTOCOL_VERSION,
+        "transport": "Streamable HTTP (2025-03-26)",
+        "stations_loaded": len(station_service.stations),
+        "tools": [tool["name"] for tool in MCP_TOOLS],
+        "active_sessions": len(connected_clients)
+    }
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "healthy",
+        "timestamp": _now_iso(),
+        "stations": len(station_service.stations),
+        "active_sessions": len(connected_clients)
+    }
+
+@app.get("/schema/tools")
+async def get_tools_schema():
+    return {
+        "tools": MCP_TOOLS,
+        "schema_version": "http://json-schema.org/draft-07/schema#"
+    }
+
+# MCP Streamable HTTP Transport Endpoints (2025-03-26 spec)
+
+async def mcp_options(request: Request):
+    """Handle CORS preflight for /mcp endpoint"""
+    return ORJSONResponse(
+        {},
+        headers={
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "GET, POST, DELETE, OPTIONS",
+            "Access-Control-Allow-Headers": "Content-Type, Authorization, Mcp-Session-Id",
+        }
+    )
+
+async def mcp_endpoint_get(request: Request):
+    """MCP Streamable HTTP Endpoint - GET for SSE connection (optional)"""
+    # Generate session ID for this connection
+    session_id = secrets.token_hex(16)
+    logger.info(f"New MCP GET connection established - Session ID: {session_id}")
+    
+    # Store client connection info
+    connected_clients[session_id] = {
+        "connected_at": _now_iso(),
+        "user_agent": request.headers.get("user-agent", ""),
+        "client_ip": request.client.host if request.client else "unknown",
+        "initialized": False,
+        "protocol_version": MCP_PROTOCOL_VERSION
+    }
+    
+    async def generate_events():
+        try:
+            # Keep connection alive with periodic pings
+            while True:
+                await _ping_event.wait()  # Send ping every PING_INTERVAL seconds
+                yield f'event: ping\ndata: {{"timestamp":"{_now_iso()}"}}\n\n'
+                # 连接仍然存活，刷新会话过期时间
+                if session_id in connected_clients:
+                    connected_clients[session_id] = connected_clients[session_id]
+                
+        except asyncio.CancelledError:
+            logger.info(f"MCP GET connection closed - Session ID: {session_id}")
+            # Clean up client connection
+            connected_clients.pop(session_id, None)
+        except Exception as e:
+            logger.error(f"MCP GET error for session {session_id}: {e}")
+            # Clean up client connection
+            connected_clients.pop(session_id, None)
+    
+    return StreamingResponse(
+        generate_events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "*",
+            "X-Accel-Buffering": "no",  # Disable nginx buffering
+            "Mcp-Session-Id": session_id  # Return session ID in header
+        }
+    )
+
+async def mcp_endpoint_post(request: Request):
+    """MCP Streamable HTTP Endpoint - POST for JSON-RPC messages"""
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        logger.error("Invalid JSON in request")
+        return ORJSONResponse(
+            {
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": {
+                    "code": -32700,
+                    "message": "Parse error"
+                }
+            },
+            status_code=400
+        )
+    
+    if not isinstance(data, list):
+        return await _handle_message(request, data)
+    
+    # JSON-RPC 批量请求：并发处理各条消息，按顺序合并响应，通知不产生响应
+    if not data:
+        return ORJSONResponse(
+            {
+                "jsonrpc": "2.0",
+                "id": None,
+                "error": {
+                    "code": -32600,
+                    "message": "Invalid Request"
+                }
+            },
+            status_code=400
+        )
+    # initialize 需要在响应头中返回 Mcp-Session-Id，规范规定不能放在批量请求中
+    init_item = next((item for item in data if isinstance(item, dict) and item.get("method") == "initialize"), None)
+    if init_item is not None:
+        return ORJSONResponse(
+            {
+                "jsonrpc": "2.0",
+                "id": init_item.get("id"),
+                "error": {
+                    "code": -32600,
+                    "message": "Invalid Request: initialize must not be part of a JSON-RPC batch"
+                }
+            },
+            status_code=400
+        )
+    responses = await asyncio.gather(*(_handle_message(request, item) for item in data))
+    bodies = [r.body for r in responses if r.body]
+    if not bodies:
+        return Response(status_code=202)
+    return Response(content=b"[" + b",".join(bodies) + b"]", media_type="application/json")
+
+async def _handle_message(request: Request, data: Any) -> Response:
+    """处理单条 JSON-RPC 消息"""
+    request_id = None
+    try:
+        # Validate JSON-RPC 2.0 format
+        if not isinstance(data, dict) or data.get("jsonrpc") != "2.0":
+            raise HTTPException(status_code=400, detail="Invalid JSON-RPC 2.0 message")
+        
+        method = data.get("method")
+        params = data.get("params", {})
+        request_id = data.get("id")
+        
+        if not method:
+            raise HTTPException(status_code=400, detail="Method is required")
+        
+        logger.info(f"Received MCP request: {method} (ID: {request_id})")
+        
+        # Handle initialization - no session ID required for this
+        if method == "initialize":
+            client_capabilities = params.get("capabilities", {})
+            client_protocol_version = params.get("protocolVersion", MCP_PROTOCOL_VERSION)
+            client_info = params.get("clientInfo", {})
+            
+            logger.info(f"Initialize request - Client Protocol: {client_protocol_version}")
+            logger.info(f"Client Info: {client_info}")
+            
+            # Generate new session ID for this client
+            session_id = secrets.token_hex(16)
+            
+            # Store session info
+            connected_clients[session_id] = {
+                "connected_at": _now_iso(),
+                "user_agent": request.headers.get("user-agent", ""),
+                "client_ip": request.client.host if request.client else "unknown",
+                "initialized": False,
+                "protocol_version": client_protocol_version
+            }
+            
+            # Accept the client's protocol version or use our default
+            accepted_version = client_protocol_version if client_protocol_version else MCP_PROTOCOL_VERSION
+            
+            response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "protocolVersion": accepted_version,
+                    "serverInfo": {
+                        "name": SERVER_NAME,
+                        "version": SERVER_VERSION,
+                        "description": "12306火车票查询服务，提供车票查询、车站搜索、中转查询等功能"
+                    },
+                    "capabilities": {
+                        "tools": {}
+                    }
+                }
+            }
+            
+            # Return response with Mcp-Session-Id header
+            logger.info(f"Initialize response sent - Protocol: {accepted_version}, Session: {session_id}")
+            return ORJSONResponse(
+                response,
+                headers={
+                    "Mcp-Session-Id": session_id,
+                    "Access-Control-Allow-Origin": "*"
+                }
+            )
+        
+        # For all other methods, require session ID
+        session_id = request.headers.get("mcp-session-id")
+        if not session_id:
+            logger.error("Missing Mcp-Session-Id header for non-initialize request")
+            return ORJSONResponse(
+                {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "error": {
+                        "code": -32000,
+                        "message": "Bad Request: No valid session ID provided"
+                    }
+                },
+                status_code=400
+            )
+        
+        # Validate session exists
+        if session_id not in connected_clients:
+            logger.error(f"Invalid session ID: {session_id}")
+            return ORJSONResponse(
+                {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "error": {
+                        "code": -32000,
+                        "message": "Invalid session ID"
+                    }
+                },
+                status_code=404  # Use 404 for invalid session as per spec
+            )
+
+        # 有活动的会话刷新过期时间
+        connected_clients[session_id] = connected_clients[session_id]
+        
+        logger.info(f"Processing message for session: {session_id}")
+        
+        # Handle tool listing
+        if method == "tools/list":
+            logger.info("Tools list requested")
+            body = b'{"jsonrpc":"2.0","id":' + orjson.dumps(request_id) + b',"result":' + _TOOLS_LIST_RESULT_BYTES + b'}'
+            return Response(content=body, media_type="application/json")
+        
+        # Handle tool execution
+        elif method == "tools/call":
+            tool_name = params.get("name")
+            arguments = params.get("arguments", {})
+            
+            if not tool_name:
+                raise HTTPException(status_code=400, detail="Tool name is required")
+            
+            logger.info(f"Executing tool: {tool_name}")
+            logger.info(f"Arguments: {arguments}")
+            
+            # 按 inputSchema 校验参数
+            validator = _VALIDATORS.get(tool_name)
+            if validator is not None:
+                try:
+                    validator(arguments)
+                except fastjsonschema.JsonSchemaException as e:
+                    logger.warning(f"Tool {tool_name} arguments rejected: {e.message}")
+                    return ORJSONResponse({
+                        "jsonrpc": "2.0",
+                        "id": request_id,
+                        "result": {
+                            "content": [{
+                                "type": "text",
+                                "text": f"参数校验失败: {e.message}"
+                            }],
+                            "isError": True
+                        }
+                    })
+            
+            # Execute the appropriate tool
+            try:
+                handler = _TOOL_DISPATCH.get(tool_name)
+                if handler is not None:
+                    content = [c.model_dump(by_alias=True, exclude_none=True) for c in await handler(arguments)]
+                else:
+                    content = [{
+                        "type": "text", 
+                        "text": f"未知工具: {tool_name}"
+                    }]
+                
+                response = {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": content,
+                        "isError": False
+                    }
+                }
+                logger.info(f"Tool {tool_name} executed successfully")
+                
+            except Exception as tool_error:
+                logger.error(f"Tool execution error: {tool_error}")
+                response = {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "result": {
+                        "content": [{
+                            "type": "text",
+                            "text": f"工具执行失败: {str(tool_error)}"
+                        }],
+                        "isError": True
+                    }
+                }
+            
+            return ORJSONResponse(response)
+        
+        # Handle notifications (no response required)
+        elif method and method.startswith("notifications/"):
+            notification_type = method.replace("notifications/", "")
+            logger.info(f"Received notification: {notification_type}")
+            
+            # Process notification but don't send response
+            if notification_type == "initialized":
+                logger.info("Client initialized successfully - MCP handshake complete!")
+                # Mark session as fully initialized
+                if session_id in connected_clients:
+                    connected_clients[session_id]["initialized"] = True
+            
+            # Notifications should return 202 Accepted according to MCP spec
+            return Response(status_code=202)  # Accepted
+        
+        # Handle ping requests
+        elif method == "ping":
+            body = _PING_TEMPLATE % (orjson.dumps(request_id), _now_iso().encode())
+            return Response(content=body, media_type="application/json")
+        
+        # Unknown method
+        else:
+            logger.warning(f"Unknown method: {method}")
+            error_response = {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {
+                    "code": -32601,
+                    "message": "Method not found",
+                    "data": {"method": method}
+                }
+            }
+            return ORJSONResponse(error_response, status_code=404)
+            
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        return ORJSONResponse(
+            {
+                "jsonrpc": "2.0", 
+                "id": request_id,
+                "error": {
+                    "code": -32603,
+                    "message": "Internal error",
+                    "data": {"error": str(e)}
+                }
+            },
+            status_code=500
+        )
+
+async def mcp_endpoint_delete(request: Request):
+    """MCP Streamable HTTP Endpoint - DELETE for session termination"""
+    session_id = request.headers.get("mcp-session-id")
+    
+    if not session_id:
+        return ORJSONResponse(
+            {"error": "Missing Mcp-Session-Id header"},
+            status_code=400
+        )
+    
+    if session_id in connected_clients:
+        del connected_clients[session_id]
+        logger.info(f"Session terminated: {session_id}")
+        return Response(status_code=200)
+    else:
+        return ORJSONResponse(
+            {"error": "Invalid session ID"},
+            status_code=404
+        )
+
+# /mcp 直接注册为 Starlette 路由：请求体由处理函数自行解析，不经过 FastAPI 的依赖注入和参数校验
+app.add_route("/mcp", mcp_options, methods=["OPTIONS"])
+app.add_route("/mcp", mcp_endpoint_get, methods=["GET"])
+app.add_route("/mcp", mcp_endpoint_post, methods=["POST"])
+app.add_route("/mcp", mcp_endpoint_delete, methods=["DELETE"])
+
+# 三字码判断：恰好 3 个大写英文字母
+_is_telecode = re.compile(r"[A-Z]{3}").fullmatch
+
+# 余票数据中 "预订" 字段之后依次为列车编号、车次号
+_BOOKING_ANCHOR = "|预订|"
+
+# 车次号格式：字母 + 数字（如 G1234），区别于列车编号
+def _is_train_code(s: str) -> bool:
+    head = s.rstrip("0123456789")
+    return len(head) < len(s) and head.isascii() and head.isalpha() and head.isupper()
+
+# 车站名/三字码自动转换，直接查车站服务的字典索引
+def ensure_telecode(val):
+    if _is_telecode(val):
+        return val
+    return station_service.code_by_name(val)
+
+# 解析票务字符串
+# 票务字段名与其在 '|' 分隔字段中的下标，itemgetter 一次取出全部字段
+_TICKET_FIELDS = (
+    ("train_no", 3),
+    ("start_time", 8),
+    ("arrive_time", 9),
+    ("duration", 10),
+    ("business_seat_num", 32),
+    ("first_class_num", 31),
+    ("second_class_num", 30),
+    ("advanced_soft_sleeper_num", 21),
+    ("soft_sleeper_num", 23),
+    ("dongwo_num", 33),
+    ("hard_sleeper_num", 28),
+    ("soft_seat_num", 24),
+    ("hard_seat_num", 29),
+    ("no_seat_num", 26),
+)
+_TICKET_KEYS = tuple(name for name, _ in _TICKET_FIELDS)
+_get_ticket_fields = operator.itemgetter(*(index for _, index in _TICKET_FIELDS))
+
+# 余票字段 -> 输出座位类型，按输出顺序排列
+_TICKET_SEAT_FIELDS = (
+    ("business_seat_num", "business"),
+    ("first_class_num", "first_class"),
+    ("second_class_num", "second_class"),
+    ("advanced_soft_sleeper_num", "advanced_soft_sleeper"),
+    ("soft_sleeper_num", "soft_sleeper"),
+    ("hard_sleeper_num", "hard_sleeper"),
+    ("soft_seat_num", "soft_seat"),
+    ("hard_seat_num", "hard_seat"),
+    ("no_seat_num", "no_seat"),
+    ("dongwo_num", "dongwo"),
+)
+
+# 中转方案分页查询时每批并发预取的页数
+TRANSFER_PREFETCH_PAGES = 4
+
+# 中转方案车次段字段 -> 座位类型
+_TRANSFER_SEAT_FIELDS = (
+    ("swz_num", "商务座"),
+    ("tz_num", "特等座"),
+    ("zy_num", "一等座"),
+    ("ze_num", "二等座"),
+    ("gr_num", "高级软卧"),
+    ("rw_num", "软卧"),
+    ("rz_num", "一等卧"),
+    ("yw_num", "硬卧"),
+    ("yz_num", "硬座"),
+    ("wz_num", "无座"),
+)
+
+def parse_ticket_string(parts, query):
+    """parts 为已按 '|' 切分的票务字段列表"""
+    if len(parts) < 35:
+        return None
+    ticket = dict(zip(_TICKET_KEYS, _get_ticket_fields(parts)))
+    ticket["from_station"] = query["from_station"]
+    ticket["to_station"] = query["to_station"]
+    ticket["train_date"] = query["train_date"]
+    return ticket
+
+def _extract_train_info(ticket_str):
+    """从车次字符串中提取 (列车编号, 车次号)，只解析 "|预订|" 之后的两个字段，不切分整行"""
+    idx = ticket_str.find(_BOOKING_ANCHOR)
+    if idx < 0:
+        return None
+    train_no, sep, tail = ticket_str[idx + len(_BOOKING_ANCHOR):].partition('|')
+    if not sep:
+        return None
+    return train_no.strip(), tail.partition('|')[0].strip().upper()
+
+# 车站模糊搜索工具
+async def search_stations_validated(args: dict) -> List[TextContent]:
+    query = args.get("query", "").strip()
+    limit = args.get("limit", 10)
+    if not query:
+        return _text_result({"success": False, "error": "请输入搜索关键词"})
+    if not isinstance(limit, int) or limit < 1 or limit > 50:
+        limit = 10
+    result = await station_service.search_stations(query, limit)
+    if result.stations:
+        stations_data = []
+        for station in result.stations:
+            station_dict = {
+                "name": station.name,
+                "code": station.code,
+                "pinyin": station.pinyin,
+                "py_short": station.py_short if station.py_short else "",
+            }
+            if hasattr(station, 'num') and station.num:
+                station_dict["num"] = station.num
+            stations_data.append(station_dict)
+        
+        response_data = {
+            "success": True,
+            "query": query,
+            "count": len(stations_data),
+            "stations": stations_data
+        }
+        return _text_result(response_data)
+    else:
+        response_data = {
+            "success": False,
+            "query": query,
+            "count": 0,
+            "stations": [],
+            "message": "未找到匹配的车站",
+            "suggestions": [
+                "尝试完整城市名称 (如: 北京)",
+                "尝试拼音 (如: beijing)",
+                "尝试简拼 (如: bj)",
+                "检查拼写是否正确"
+            ]
+        }
+        return _text_result(response_data)
+
+# ========== query_tickets_validated 重构 ========== 
+async def query_tickets_validated(args: dict) -> List[TextContent]:
+    try:
+        from_station = args.get("from_station", "").strip()
+        to_station = args.get("to_station", "").strip()
+        train_date = args.get("train_date", "").strip()
+        logger.info(f"查询参数: {from_station} -> {to_station} ({train_date})")
+        errors = []
+        if not from_station:
+            errors.append("出发站不能为空")
+        if not to_station:
+            errors.append("到达站不能为空")
+        if not train_date:
+            errors.append("出发日期不能为空")
+        elif not validate_date(train_date):
+            errors.append("日期格式错误，请使用 YYYY-MM-DD 格式")
+        else:
+            # 检查日期是否早于今天
+            is_valid, error_msg = validate_date_not_past(train_date)
+            if not is_valid:
+                errors.append(error_msg)
+        
+        if errors:
+            response_data = {"success": False, "errors": errors}
+            return _text_result(response_data)
+        from_code = ensure_telecode(from_station)
+        to_code = ensure_telecode(to_station)
+        if not from_code or not to_code:
+            suggestions = []
+            if not from_code:
+                result = await station_service.search_stations(from_station, 3)
+                if result.stations:
+                    suggestions.append({"station_type": "from", "input": from_station, "matches": [{"name": s.name, "code": s.code, "pinyin": s.pinyin, "py_short": s.py_short} for s in result.stations]})
+            if not to_code:
+                result = await station_service.search_stations(to_station, 3)
+                if result.stations:
+                    suggestions.append({"station_type": "to", "input": to_station, "matches": [{"name": s.name, "code": s.code, "pinyin": s.pinyin, "py_short": s.py_short} for s in result.stations]})
+            response_data = {"success": False, "error": "车站名称无效", "suggestions": suggestions, "hint": "可尝试拼音、简拼、三字码或用 search_stations 工具辅助查询"}
+            return _text_result(response_data)
+        
+        url_u = HTTP_URLS["query_left_ticket"]
+        client = get_http_client()
+        max_retries = 3
+        tickets_data = []
+
+        for attempt in range(max_retries):
+            try:
+                params = {
+                    "leftTicketDTO.train_date": train_date,
+                    "leftTicketDTO.from_station": from_code,
+                    "leftTicketDTO.to_station": to_code,
+                    "purpose_codes": "ADULT"
+                }
+                resp = await _get_12306(client, url_u, params)
+                logger.info(f"12306 queryG status: {resp.status_code}, url: {resp.url}")
+                if resp.status_code != 200:
+                    logger.error(f"12306接口返回异常: {resp.status_code}, body: {resp.text}")
+                    response_data = {"success": False, "error": "12306接口返回异常", "status_code": resp.status_code, "detail": resp.text[:200]}
+                    return _text_result(response_data)
+                try:
+                    data = orjson.loads(resp.content).get("data", {})
+                    tickets_data = data.get("result", [])
+                    break  # Success
+                except Exception as e:
+                    logger.error(f"12306响应解析失败: {repr(e)}，原始内容: {resp.text}")
+                    response_data = {"success": False, "error": "12306响应解析失败", "detail": f"{type(e).__name__}: {str(e)}"}
+                    return _text_result(response_data)
+            except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
+                if _should_retry(e, attempt, max_retries):
+                    logger.warning(f"查询车票网络请求失败，正在重试 ({attempt + 1}/{max_retries}): {str(e)}")
+                    await asyncio.sleep(_backoff_delay(attempt))
+                    continue
+                logger.error(f"查询车票网络请求重试终止: {str(e)}")
+                response_data = {"success": False, "error": f"网络请求失败 (已尝试{attempt + 1}次): {str(e)}"}
+                return _text_result(response_data)
+        # 每行只切分一次，解析结果与原始字段一一对应
+        query_info = {
+            "from_station": from_station,
+            "to_station": to_station,
+            "train_date": train_date
+        }
+        tickets = []
+        for ticket_str in tickets_data:
+            parts = ticket_str.split('|')
+            ticket = parse_ticket_string(parts, query_info)
+            if ticket:
+                tickets.append((parts, ticket))
+        if tickets:
+            # 同一线路的车次大量重复相同的起止站，三字码去重后各解析一次
+            unique_codes = {parts[i] for parts, _ in tickets for i in (6, 7) if parts[i]}
+            station_by_code = station_service.station_by_code
+            station_names = {
+                code: station_obj.name if (station_obj := station_by_code(code)) else code
+                for code in unique_codes
+            }
+            trains_list = []
+            for parts, ticket in tickets:
+                from_code_actual = parts[6]
+                to_code_actual = parts[7]
+                from_station_name = station_names[from_code_actual] if from_code_actual else "未知"
+                to_station_name = station_names[to_code_actual] if to_code_actual else "未知"
+
+                seats = {name: ticket[field] for field, name in _TICKET_SEAT_FIELDS if ticket[field]}
+                
+                train_data = {
+                    "train_no": ticket['train_no'],
+                    "from_station": from_station_name,
+                    "from_station_code": from_code_actual,
+                    "to_station": to_station_name,
+                    "to_station_code": to_code_actual,
+                    "start_time": ticket['start_time'],
+                    "arrive_time": ticket['arrive_time'],
+                    "duration": ticket['duration'],
+                    "seats": seats
+                }
+                trains_list.append(train_data)
+            
+            response_data = {
+                "success": True,
+                "from_station": from_station,
+                "to_station": to_station,
+                "train_date": train_date,
+                "count": len(trains_list),
+                "trains": trains_list
+            }
+            return _text_result(response_data)
+        else:
+            response_data = {
+                "success": False,
+                "from_station": from_station,
+                "to_station": to_station,
+                "train_date": train_date,
+                "count": 0,
+                "trains": [],
+                "message": "未找到该线路的余票"
+            }
+            return _text_result(response_data)
+    except Exception as e:
+        import traceback
+        error_detail = f"{type(e).__name__}: {str(e)}"
+        logger.error(f"查询车票失败: {error_detail}\n{traceback.format_exc()}")
+        response_data = {"success": False, "error": "查询失败", "detail": error_detail}
+        return _text_result(response_data)
+
+# ========== get_train_no_by_train_code_validated 重构 ========== 
+@dataclass(slots=True)
+class RouteArgs:
+    """车次相关查询的公共参数：已去除首尾空白，车站已转换为三字码"""
+    train_no: str
+    from_code: str
+    to_code: str
+    train_date: str
+
+
+def _parse_route_args(args: dict, train_key: str) -> Union[RouteArgs, dict]:
+    """一次完成参数清洗、日期校验和三字码转换，校验失败时返回错误响应"""
+    train_no = args.get(train_key, "").strip()
+    from_station = args.get("from_station", "").strip().upper()
+    to_station = args.get("to_station", "").strip().upper()
+    train_date = args.get("train_date", "").strip()
+    
+    # 参数校验
+    if not train_no:
+        return {"success": False, "error": f"车次编号({train_key})不能为空"}
+    if not from_station:
+        return {"success": False, "error": "出发站不能为空"}
+    if not to_station:
+        return {"success": False, "error": "到达站不能为空"}
+    if not train_date:
+        return {"success": False, "error": "出发日期不能为空"}
+    
+    # 日期格式校验和早于今天的校验
+    is_valid, error_msg = validate_date_not_past(train_date)
+    if not is_valid:
+        return {"success": False, "error": error_msg}
+    
+    # 三字码转换
+    from_code = ensure_telecode(from_station)
+    if not from_code:
+        return {"success": False, "error": f"出发站无效或无法识别：{from_station}"}
+    to_code = ensure_telecode(to_station)
+    if not to_code:
+        return {"success": False, "error": f"到达站无效或无法识别：{to_station}"}
+    
+    return RouteArgs(train_no=train_no, from_code=from_code, to_code=to_code, train_date=train_date)
+
+
+async def _resolve_train_no(args: dict) -> dict:
+    """
+    根据车次号、出发站、到达站、日期，查询唯一列车编号train_no。
+    只允许精确匹配，所有参数必须为全名或三字码。
+    直接请求 /otn/leftTicket/queryG。
+    """
+    parsed = _parse_route_args(args, "train_code")
+    if isinstance(parsed, dict):
+        return parsed
+    return await _lookup_train_no(parsed)
+
+
+async def _lookup_train_no(route: RouteArgs) -> dict:
+    """按已解析的参数查询车次号对应的列车编号"""
+    train_code = route.train_no.upper()
+    from_station = route.from_code
+    to_station = route.to_code
+    train_date = route.train_date
+    
+    # HTTP 请求 - 复用共享客户端
+    url_u = HTTP_URLS["query_left_ticket"]
+    
+    client = get_http_client()
+    params = {
+        "leftTicketDTO.train_date": train_date,
+        "leftTicketDTO.from_station": from_station,
+        "leftTicketDTO.to_station": to_station,
+        "purpose_codes": "ADULT"
+    }
+    resp = await _get_12306(client, url_u, params)
+    try:
+        data = orjson.loads(resp.content).get("data", {})
+        tickets_data = data.get("result", [])
+    except Exception:
+        response_data = {"success": False, "error": "12306反爬拦截或数据异常，请稍后重试"}
+        return response_data
+
+    if not tickets_data:
+        response_data = {"success": False, "error": f"未找到该线路的余票数据（{from_station}->{to_station} {train_date}）"}
+        return response_data
+    
+    # 查找匹配的车次，同时收集扫描过的车次号（未找到时用于调试）
+    found = None
+    debug_codes = []
+    for ticket_str in tickets_data:
+        info = _extract_train_info(ticket_str)
+        if info is None:
+            continue
+        if info[1] == train_code:
+            found = info[0]
+            break
+        debug_codes.append(info[1])
+    
+    if not found:
+        response_data = {
+            "success": False,
+            "train_code": train_code,
+            "from_station": from_station,
+            "to_station": to_station,
+            "train_date": train_date,
+            "error": "未找到该车次号的列车编号",
+            "available_trains": debug_codes
+        }
+        return response_data
+    
+    response_data = {
+        "success": True,
+        "train_code": train_code,
+        "train_no": found,
+        "from_station": from_station,
+        "to_station": to_station,
+        "train_date": train_date
+    }
+    return response_data
+
+async def get_train_no_by_train_code_validated(args: dict) -> List[TextContent]:
+    """查询列车编号工具，结果由 _resolve_train_no 生成"""
+    return _text_result(await _resolve_train_no(args))
+
+def _make_station_dict(station: dict) -> dict:
+    """经停站输出格式，缺少 station_no/station_name 时回退到 from_station_* 字段"""
+    return {
+        "station_no": station["station_no"] if "station_no" in station else station.get("from_station_no", ""),
+        "station_name": station["station_name"] if "station_name" in station else station.get("from_station_name", ""),
+        "arrive_time": station.get("arrive_time", "----"),
+        "start_time": station.get("start_time", "----"),
+        "stopover_time": station.get("stopover_time", "----")
+    }
+
+# ========== get_train_route_stations_validated 函数实现 ==========
+async def get_train_route_stations_validated(args: dict) -> List[TextContent]:
+    """
+    查询指定车次的所有经停站及时刻信息。
+    参数: train_no(列车编号或车次号), from_station(出发站), to_station(到达站), train_date(日期)
+    自动检测输入是车次号还是列车编号，如果是车次号则先转换为列车编号。
+    """
+    try:
+        parsed = _parse_route_args(args, "train_no")
+        if isinstance(parsed, dict):
+            return _text_result(parsed)
+        train_no = parsed.train_no
+        from_station = parsed.from_code
+        to_station = parsed.to_code
+        train_date = parsed.train_date
+        
+        # 检测输入是车次号还是列车编号
+        # 列车编号格式通常为: 5700xxx或类似的长数字+字母格式（如：57000C95690L）
+        # 车次号格式通常为: 字母+数字（如：C9569、G1234、T456）
+        is_train_code = _is_train_code(train_no)
+        
+        if is_train_code:
+            # 输入的是车次号，需要先转换为列车编号
+            logger.info(f"检测到车次号 {train_no}，正在转换为列车编号...")
+            result_data = await _lookup_train_no(parsed)
+            if not result_data.get("success"):
+                return _text_result(result_data)  # 返回错误信息
+            
+            actual_train_no = result_data.get("train_no")
+            if not actual_train_no:
+                response_data = {"success": False, "error": f"无法解析车次 {train_no} 的列车编号"}
+                return _text_result(response_data)
+            logger.info(f"车次 {train_no} 转换为列车编号: {actual_train_no}")
+        else:
+            # 输入的是列车编号，直接使用
+            actual_train_no = train_no
+            logger.info(f"使用列车编号: {actual_train_no}")
+        
+        # 调用12306经停站接口 - 使用正确的API端点
+        url = HTTP_URLS["query_route_stations"]
+        params = {
+            "train_no": actual_train_no,  # 使用转换后的列车编号
+            "from_station_telecode": from_station,
+            "to_station_telecode": to_station,
+            "depart_date": train_date
+        }
+        
+        
+        max_retries = 3
+        json_data = None
+
+        for attempt in range(max_retries):
+            try:
+                client = get_http_client()
+                
+                resp = await _get_12306(client, url, params)
+                logger.info(f"12306 route query status: {resp.status_code}, url: {resp.url}")
+                
+                # 检查HTTP状态码
+                if resp.status_code != 200:
+                    logger.error(f"12306接口返回异常状态码: {resp.status_code}, body: {resp.text}")
+                    response_data = {"success": False, "error": f"12306接口返回异常: {resp.status_code}"}
+                    return _text_result(response_data)
+                
+                # 检查是否被重定向到错误页面
+                if "error.html" in str(resp.url) or "ntce" in str(resp.url):
+                    response_data = {"success": False, "error": "12306反爬虫拦截，请稍后重试或更换网络环境"}
+                    return _text_result(response_data)
+                
+                try:
+                    json_data = orjson.loads(resp.content)
+                    logger.info(f"12306 response keys: {list(json_data.keys()) if json_data else 'None'}")
+                    break # Success
+                except Exception as e:
+                    logger.error(f"12306响应解析失败: {str(e)}, body: {resp.text}")
+                    response_data = {"success": False, "error": f"12306响应解析失败: {str(e)}"}
+                    return _text_result(response_data)
+            except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
+                if _should_retry(e, attempt, max_retries):
+                    logger.warning(f"查询经停站网络请求失败，正在重试 ({attempt + 1}/{max_retries}): {str(e)}")
+                    await asyncio.sleep(_backoff_delay(attempt))
+                    continue
+                logger.error(f"查询经停站网络请求重试终止: {str(e)}")
+                response_data = {"success": False, "error": f"网络请求失败 (已尝试{attempt + 1}次): {str(e)}"}
+                return _text_result(response_data)
+        
+        if not json_data:
+            response_data = {"success": False, "error": "12306接口返回空数据"}
+            return _text_result(response_data)
+        
+        # 解析经停站数据 - 使用与参考实现相同的数据结构解析
+        data = json_data.get("data", {})
+        # 兼容官方经停站接口返回的多种数据结构，按优先级取第一个非空结果
+        stations = (
+            data.get("data")
+            or [s for m in data.get("middleList") or () for s in m.get("fullList") or ()]
+            or data.get("fullList")
+            or data.get("route")
+            or []
+        )
+        
+        if not stations:
+            response_data = {"success": False, "train_no": train_no, "error": "未找到经停站信息"}
+            return _text_result(response_data)
+        
+        # 格式化输出JSON
+        stations_list = [_make_station_dict(station) for station in stations]
+        
+        response_data = {
+            "success": True,
+            "train_no": train_no,
+            "train_date": train_date,
+            "count": len(stations_list),
+            "stations": stations_list
+        }
+        return _text_result(response_data)
+        
+    except Exception as e:
+        logger.error(f"查询经停站失败: {repr(e)}")
+        response_data = {"success": False, "error": "查询经停站失败", "detail": str(e)}
+        return _text_result(response_data)
+
+# ========== query_transfer_validated 函数实现 ==========
+async def query_transfer_validated(args: dict) -> List[TextContent]:
+    """
+    查询中转换乘方案。使用参考代码的正确实现方式。
+    支持指定中转站、学生票、无座车次等选项，自动分页获取所有中转方案。
+    """
+    try:
+        from_station = args.get("from_station", "").strip()
+        to_station = args.get("to_station", "").strip()
+        train_date = args.get("train_date", "").strip()
+        middle_station = args.get("middle_station", "").strip() if "middle_station" in args else ""
+        isShowWZ = args.get("isShowWZ", "N").strip().upper() or "N"
+        purpose_codes = args.get("purpose_codes", "00").strip().upper() or "00"
+        
+        # 参数校验
+        if not from_station or not to_station or not train_date:
+            response_data = {"success": False, "error": "请输入出发站、到达站和出发日期"}
+            return _text_result(response_data)
+        
+        # 日期格式校验和早于今天的校验
+        is_valid, error_msg = validate_date_not_past(train_date)
+        if not is_valid:
+            response_data = {"success": False, "error": error_msg}
+            return _text_result(response_data)
+        
+        # 自动转三字码 - 使用参考代码的实现
+        from_code = ensure_telecode(from_station)
+        to_code = ensure_telecode(to_station)
+        if not from_code:
+            response_data = {"success": False, "error": f"出发站无效或无法识别：{from_station}"}
+            return _text_result(response_data)
+        if not to_code:
+            response_data = {"success": False, "error": f"到达站无效或无法识别：{to_station}"}
+            return _text_result(response_data)
+
+        # 处理中转站：如果是中文名称，尝试转换为三字码
+        middle_station_code = ""
+        if middle_station:
+            middle_station_code = ensure_telecode(middle_station)
+            if not middle_station_code:
+                # 如果转换失败，记录日志但继续尝试使用原值（虽然很可能失败）
+                logger.warning(f"无法识别中转站: {middle_station}")
+                middle_station_code = middle_station 
+        
+        # 使用中转查询专用接口
+        url = HTTP_URLS["query_transfer"]
+        
+        async def fetch_transfer_page(result_index):
+            """查询一页中转方案，返回 (中转方案列表, 错误信息)"""
+            params = {
+                "train_date": train_date,
+                "from_station_telecode": from_code,
+                "to_station_telecode": to_code,
+                "middle_station": middle_station_code,
+                "result_index": str(result_index),
+                "can_query": "Y",
+                "isShowWZ": isShowWZ,
+                "purpose_codes": purpose_codes,
+                "channel": "E"
+            }
+            resp = await _get_12306(get_http_client(), url, params)
+            
+            # 检查反爬虫
+            if resp.status_code == 302 or "error.html" in str(resp.headers.get("location", "")):
+                return None, "12306反爬虫拦截（302跳转），请稍后重试或更换网络环境"
+            # 被反爬拦截时返回的是 HTML 页面，先看首字节，避免走异常分支
+            if not _looks_like_json(resp.content):
+                return None, "12306反爬拦截或数据异常，请稍后重试"
+            try:
+                data = orjson.loads(resp.content).get("data", {})
+                return data.get("middleList", []), None
+            except Exception:
+                return None, "12306反爬拦截或数据异常，请稍后重试"
+        
+        all_transfer_list = []
+        max_retries = 3
+
+        for attempt in range(max_retries):
+            try:
+                # 分页查询所有中转方案：先取第一页，之后每批并发预取多页
+                page_size = 10
+                transfer_list, error = await fetch_transfer_page(0)
+                if error:
+                    response_data = {"success": False, "error": error}
+                    return _text_result(response_data)
+                
+                pages = [transfer_list]
+                next_index = page_size
+                while True:
+                    finished = False
+                    for transfer_list in pages:
+                        # 后续页被拦截、解析失败或没有数据时，保留已获取的结果
+                        if not transfer_list:
+                            finished = True
+                            break
+                        all_transfer_list.extend(transfer_list)
+                        # 如果返回的数据少于页面大小，说明已经是最后一页
+                        if len(transfer_list) < page_size:
+                            finished = True
+                            break
+                    if finished:
+                        break
+                    
+                    indices = range(next_index, next_index + page_size * TRANSFER_PREFETCH_PAGES, page_size)
+                    next_index += page_size * TRANSFER_PREFETCH_PAGES
+                    # 等整批请求都结束后再抛出其中的异常（交给外层重试），避免其余请求的异常无人获取
+                    results = await asyncio.gather(*(fetch_transfer_page(i) for i in indices), return_exceptions=True)
+                    for result in results:
+                        if isinstance(result, BaseException):
+                            raise result
+                    pages = [transfer_list for transfer_list, _ in results]
+                
+                # Success
+                break
+            except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
+                # 清空可能已获取的部分数据，准备重试
+                all_transfer_list = []
+                if _should_retry(e, attempt, max_retries):
+                    logger.warning(f"中转查询网络请求失败，正在重试 ({attempt + 1}/{max_retries}): {str(e)}")
+                    await asyncio.sleep(_backoff_delay(attempt))
+                    continue
+                logger.error(f"中转查询网络请求重试终止: {str(e)}")
+                response_data = {"success": False, "error": f"网络请求失败 (已尝试{attempt + 1}次): {str(e)}"}
+                return _text_result(response_data)
+        
+        if not all_transfer_list:
+            response_data = {
+                "success": False,
+                "from_station": from_station,
+                "to_station": to_station,
+                "train_date": train_date,
+                "count": 0,
+                "transfers": [],
+                "message": "未查到中转方案"
+            }
+            return _text_result(response_data)
+        
+        # 构建JSON格式的中转方案数据
+        transfers_list = []
+        for item in all_transfer_list:
+            try:
+                # 优先用 fullList，降级用 trainList
+                full_list = item.get("fullList") or item.get("trainList") or []
+                if len(full_list) < 2:
+                    continue
+                
+                # 解析每段车次
+                segments = []
+                for seg in full_list:
+                    # 座位余票信息 - 只包含有票的座位类型
+                    seats = {name: v for field, name in _TRANSFER_SEAT_FIELDS if (v := seg.get(field)) and v != "--"}
+                    
+                    segment_data = {
+                        "train_code": seg.get("station_train_code", ""),
+                        "from_station": seg.get("from_station_name", ""),
+                        "to_station": seg.get("to_station_name", ""),
+                        "start_time": seg.get("start_time", ""),
+                        "arrive_time": seg.get("arrive_time", ""),
+                        "duration": seg.get("lishi", ""),
+                        "seats": seats
+                    }
+                    segments.append(segment_data)
+                
+                transfer_data = {
+                    "middle_station": item.get("middle_station_name") or (full_list[0].get("to_station_name", "") if full_list else ""),
+                    "wait_time": item.get("wait_time", ""),
+                    "total_duration": item.get("all_lishi", ""),
+                    "segments": segments
+                }
+                transfers_list.append(transfer_data)
+                
+            except Exception as e:
+                logger.warning(f"解析中转方案失败: {e}")
+                continue
+        
+        response_data = {
+            "success": True,
+            "from_station": from_station,
+            "to_station": to_station,
+            "train_date": train_date,
+            "count": len(transfers_list),
+            "transfers": transfers_list
+        }
+        return _text_result(response_data)
+        
+    except Exception as e:
+        logger.error(f"查询中转失败: {repr(e)}")
+        response_data = {"success": False, "error": "查询中转失败", "detail": str(e)}
+        return _text_result(response_data)
+
+
+# ========== query_ticket_price_validated 函数实现 ==========
+async def query_ticket_price_validated(args: dict) -> List[TextContent]:
+    """
+    查询火车票价信息
+    """
+    try:
+        from_station = args.get("from_station", "").strip()
+        to_station = args.get("to_station", "").strip()
+        train_date = args.get("train_date", "").strip()
+        purpose_codes = args.get("purpose_codes", "ADULT").strip()
+        train_code = args.get("train_code", "").strip().upper()
+        
+        # 参数校验
+        if not from_station or not to_station or not train_date:
+            response_data = {"success": False, "error": "请输入出发站、到达站和出发日期"}
+            return _text_result(response_data)
+            
+        # 日期格式校验和早于今天的校验
+        is_valid, error_msg = validate_date_not_past(train_date)
+        if not is_valid:
+            response_data = {"success": False, "error": error_msg}
+            return _text_result(response_data)
+
+        # 转换三字码
+        from_code = ensure_telecode(from_station)
+        to_code = ensure_telecode(to_station)
+        
+        if not from_code:
+             response_data = {"success": False, "error": f"出发站无效: {from_station}"}
+             return _text_result(response_data)
+        if not to_code:
+             response_data = {"success": False, "error": f"到达站无效: {to_station}"}
+             return _text_result(response_data)
+
+        url_price = HTTP_URLS["query_price"]
+        
+        params = {
+            "leftTicketDTO.train_date": train_date,
+            "leftTicketDTO.from_station": from_code,
+            "leftTicketDTO.to_station": to_code,
+            "purpose_codes": purpose_codes
+        }
+
+        max_retries = 3
+        json_data = None
+
+        for attempt in range(max_retries):
+            try:
+                client = get_http_client()
+                resp = await _get_12306(client, url_price, params)
+                logger.info(f"12306 price query status: {resp.status_code}, url: {resp.url}")
+                
+                if resp.status_code != 200:
+                     logger.error(f"12306接口返回异常: {resp.status_code}")
+                     response_data = {"success": False, "error": f"12306接口返回异常: {resp.status_code}"}
+                     return _text_result(response_data)
+                
+                try:
+                    json_data = orjson.loads(resp.content)
+                    break
+                except Exception as e:
+                    logger.error(f"12306响应解析失败: {str(e)}")
+                    response_data = {"success": False, "error": "12306响应解析失败", "detail": str(e)}
+                    return _text_result(response_data)
+            except (httpx.TimeoutException, httpx.NetworkError, httpx.ConnectError) as e:
+                if _should_retry(e, attempt, max_retries):
+                    logger.warning(f"票价查询网络请求失败，正在重试 ({attempt + 1}/{max_retries}): {str(e)}")
+                    await asyncio.sleep(_backoff_delay(attempt))
+                    continue
+                logger.error(f"票价查询网络请求重试终止: {str(e)}")
+                response_data = {"success": False, "error": f"网络请求失败 (已尝试{attempt + 1}次): {str(e)}"}
+                return _text_result(response_data)
+
+        # 解析票价信息
+        if json_data and "data" in json_data:
+            result_data = []
+            price_map = {
+                "wz_price": "无座",
+                "yz_price": "硬座",
+                "yw_price": "硬卧",
+                "rw_price": "软卧",
+                "gr_price": "高级软卧",
+                "ze_price": "二等座",
+                "zy_price": "一等座",
+                "swz_price": "商务座",
+                "tdz_price": "特等座",
+                "dw_price": "动卧"
+            }
+            
+            for item in json_data.get("data", []):
+                query_left_new_dto = item.get("queryLeftNewDTO", {})
+                
+                # 如果指定了车次号，进行过滤
+                current_train_code = query_left_new_dto.get("station_train_code", "")
+                if train_code and current_train_code != train_code:
+                    continue
+                
+                train_info = {
+                    "train_no": query_left_new_dto.get("train_no"),
+                    "train_code": current_train_code,
+                    "from_station": query_left_new_dto.get("from_station_name"),
+                    "to_station": query_left_new_dto.get("to_station_name"),
+                    "start_time": query_left_new_dto.get("start_time"),
+                    "arrive_time": query_left_new_dto.get("arrive_time"),
+                    "duration": query_left_new_dto.get("lishi"),
+                    "train_class_name": query_left_new_dto.get("train_class_name"),
+                    "prices": {}
+                }
+                
+                # 提取票价
+                for key, name in price_map.items():
+                    price_val = query_left_new_dto.get(key)
+                    if price_val and price_val != "--":
+                        try:
+                            # 12306返回的价格最后一位是角，例如"00230"表示23.0元
+                            if price_val.isdigit():
+                                price_int = int(price_val)
+                                # 插入小数点
+                                price_str = str(price_int)
+                                if len(price_str) == 1:
+                                    formatted_price = "0." + price_str
+                                else:
+                                    formatted_price = price_str[:-1] + "." + price_str[-1]
+                                train_info["prices"][name] = formatted_price
+                            else:
+                                train_info["prices"][name] = price_val
+                        except:
+                            train_info["prices"][name] = price_val
+                            
+                result_data.append(train_info)
+            
+            final_response = {
+                "success": True,
+                "from_station": from_station,
+                "to_station": to_station,
+                "train_date": train_date,
+                "count": len(result_data),
+                "data": result_data
+            }
+            return _text_result(final_response)
+
+        return _text_result(json_data)
+        
+    except Exception as e:
+        logger.error(f"查询票价失败: {repr(e)}")
+        response_data = {"success": False, "error": "查询票价失败", "detail": str(e)}
+        return _text_result(response_data)
+
+# ========== get_current_time_validated 新增时间工具 ==========
+async def get_current_time_validated(args: dict) -> List[TextContent]:
+    """
+    返回当前时间信息JSON格式
+    """
+    try:
+        timezone_str = args.get("timezone", "Asia/Shanghai")
+        date_format = args.get("format", "YYYY-MM-DD")
+        try:
+            tz = ZoneInfo(timezone_str)
+        except (ZoneInfoNotFoundError, ValueError):
+            tz = _TZ
+        now = datetime.now(tz)
+        
+        response_data = {
+            "success": True,
+            "timezone": tz.key,
+            "datetime": now.strftime("%Y-%m-%d %H:%M:%S"),
+            "date": now.strftime("%Y-%m-%d"),
+            "time": now.strftime("%H:%M:%S"),
+            "timestamp": int(now.timestamp())
+        }
+        return _text_result(response_data)
+    except Exception as e:
+        logger.error(f"获取时间信息失败: {repr(e)}")
+        response_data = {"success": False, "error": "获取时间信息失败", "detail": str(e)}
+        return _text_result(response_data)
+
+# 工具名 -> 处理函数
+_TOOL_DISPATCH: Dict[str, Callable[[dict], Awaitable[List[TextContent]]]] = {
+    "query-tickets": query_tickets_validated,
+    "query-ticket-price": query_ticket_price_validated,
+    "search-stations": search_stations_validated,
+    "query-transfer": query_transfer_validated,
+    "get-train-route-stations": get_train_route_stations_validated,
+    "get-train-no-by-train-code": get_train_no_by_train_code_validated,
+    "get-current-time": get_current_time_validated,
+}
+
+@app.on_event("startup")
+async def startup_event():
+    """应用启动时的初始化工作"""
+    logger.info("启动12306 MCP服务器...")
+    logger.info(f"协议版本: {MCP_PROTOCOL_VERSION}")
+    logger.info(f"传输类型: Streamable HTTP")
+    
+    # Load station data
+    logger.info("正在加载车站数据...")
+    await station_service.load_stations()
+    logger.info(f"已加载 {len(station_service.stations)} 个车站")
+
+    global _pinger_task
+    _pinger_task = asyncio.create_task(_pinger())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时停止心跳任务并释放共享的 HTTP 连接"""
+    global _pinger_task
+    if _pinger_task is not None:
+        _pinger_task.cancel()
+        _pinger_task = None
+    await close_http_client()
+
+async def main_server():
+    """启动MCP服务器"""
+    logger.info("启动12306 MCP服务器...")
+    logger.info(f"协议版本: {MCP_PROTOCOL_VERSION}")
+    logger.info(f"传输类型: Streamable HTTP")
+    logger.info(f"MCP端点: http://{settings.server_host}:{settings.server_port}/mcp")
+    logger.info(f"健康检查: http://{settings.server_host}:{settings.server_port}/health")
+    
+    config = uvicorn.Config(
+        app,
+        host=settings.server_host,
+        port=settings.server_port,
+        log_level=settings.log_level.lower()
+    )
+    uvicorn_server = uvicorn.Server(config)
+    await uvicorn_server.serve()
+
+def main():
+    if settings.server_workers > 1:
+        # 多进程模式：每个进程各自持有会话表和 HTTP 连接池，
+        # 需要在前端负载均衡上按 Mcp-Session-Id 做会话保持
+        logger.warning(f"以 {settings.server_workers} 个工作进程启动，会话不在进程间共享")
+        uvicorn.run(
+            "mcp_12306.server:app",
+            host=settings.server_host,
+            port=settings.server_port,
+            workers=settings.server_workers,
+            log_level=settings.log_level.lower()
+        )
+        return
+    run_event_loop(main_server())
+
+if __name__ == "__main__":
+    main()
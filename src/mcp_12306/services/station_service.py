@@ -20,9 +20,79 @@ class StationSearchResult:
     def __init__(self, stations):
         self.stations = stations
 
+class StationTrie:
+    """前缀树：键为车站名/拼音/简拼（小写），值为车站在 StationService.stations 中的下标"""
+
+    _END = ""  # 单字符键不会为空串，用作结束标记
+
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, key, index):
+        node = self._root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node.setdefault(self._END, []).append(index)
+
+    def _find(self, key):
+        node = self._root
+        for ch in key:
+            node = node.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def get(self, key):
+        """精确匹配，返回下标列表"""
+        node = self._find(key)
+        if node is None:
+            return []
+        return node.get(self._END, [])
+
+    def iter_prefix(self, prefix):
+        """遍历以 prefix 开头的所有键对应的下标"""
+        node = self._find(prefix)
+        if node is None:
+            return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for ch, child in node.items():
+                if ch == self._END:
+                    yield from child
+                else:
+                    stack.append(child)
+
+
 class StationService:
     def __init__(self):
         self.stations = []
+        self._name_trie = StationTrie()
+        self._pinyin_trie = StationTrie()
+        self._py_short_trie = StationTrie()
+        self._code_index = {}
+        self._by_code = {}
+        self._by_any = {}
+
+    def _build_index(self):
+        """按车站名、拼音、简拼建立前缀树，按三字码、车站名建立精确查找索引"""
+        self._name_trie = StationTrie()
+        self._pinyin_trie = StationTrie()
+        self._py_short_trie = StationTrie()
+        self._code_index = {}
+        self._by_code = {}
+        self._by_any = {}
+        for i, s in enumerate(self.stations):
+            self._name_trie.insert(s.name.strip().lower(), i)
+            self._pinyin_trie.insert(s.pinyin.lower(), i)
+            self._py_short_trie.insert(s.py_short.lower(), i)
+            self._code_index.setdefault(s.code.lower(), []).append(i)
+            self._by_code.setdefault(s.code, s)
+        # 车站名与三字码合并为一个索引，一次查找即可解析任一输入；车站名优先
+        for s in self.stations:
+            self._by_any.setdefault(s.name, s)
+        for code, s in self._by_code.items():
+            self._by_any.setdefault(code, s)
 
     async def load_stations(self, path=None):
         """
@@ -109,66 +179,72 @@ class StationService:
                     logging.warning(f"简拼无法修正：{st}")
             result.append(Station(name, code, pinyin, py_short, num, city))
         self.stations = result
+        self._build_index()
         logging.info(f"已加载{len(self.stations)}个车站（含城市信息，自动排列修正字段）")
 
     async def get_station_by_name(self, name):
         name = name.strip()
         if name.endswith("站") and len(name) > 2:
             name = name[:-1]
-        for s in self.stations:
+        for i in self._name_trie.get(name.lower()):
+            s = self.stations[i]
             if s.name.strip() == name:
                 return s
         return None
 
+    def station_by_code(self, code):
+        """按三字码精确查找车站（同步，直接查字典）"""
+        return self._by_code.get(code)
+
     async def get_station_by_code(self, code):
-        for s in self.stations:
-            if s.code == code:
-                return s
-        return None
+        return self.station_by_code(code)
 
     async def search_stations(self, query, limit=10):
         query = query.strip().lower()
         if query.endswith("站") and len(query) > 2:
             query = query[:-1]
-        results = []
-        matched_ids = set()
-        # 1. 精确匹配
-        for s in self.stations:
-            if (query == s.name.strip().lower() or
-                query == s.code.lower() or
-                query == s.pinyin.lower() or
-                query == s.py_short.lower()):
-                results.append(s)
-                matched_ids.add(id(s))
-                if len(results) >= limit:
-                    return StationSearchResult(results)
-        # 2. 模糊匹配（含city）
-        for s in self.stations:
-            if id(s) in matched_ids:
+        tries = (self._name_trie, self._pinyin_trie, self._py_short_trie)
+        # 1. 精确匹配（车站名、三字码、拼音、简拼）
+        exact = set(self._code_index.get(query, ()))
+        for trie in tries:
+            exact.update(trie.get(query))
+        matched_ids = sorted(exact)
+        if len(matched_ids) >= limit:
+            return StationSearchResult([self.stations[i] for i in matched_ids[:limit]])
+        # 2. 前缀匹配（车站名、拼音、简拼）
+        prefix = set()
+        for trie in tries:
+            prefix.update(trie.iter_prefix(query))
+        prefix.difference_update(exact)
+        matched_ids.extend(sorted(prefix))
+        if len(matched_ids) >= limit:
+            return StationSearchResult([self.stations[i] for i in matched_ids[:limit]])
+        # 3. 模糊匹配（含city）
+        seen = exact | prefix
+        for i, s in enumerate(self.stations):
+            if i in seen:
                 continue
             if (query in s.name.strip().lower() or
                 query in s.pinyin.lower() or
                 query in s.py_short.lower() or
                 query in s.code.lower() or
                 (s.city and query in s.city.lower())):
-                results.append(s)
-                if len(results) >= limit:
+                matched_ids.append(i)
+                if len(matched_ids) >= limit:
                     break
-        return StationSearchResult(results)
+        return StationSearchResult([self.stations[i] for i in matched_ids])
 
-    async def get_station_code(self, query: str) -> Optional[str]:
+    def code_by_name(self, query: str) -> Optional[str]:
+        """按车站名或三字码精确查找三字码（同步，直接查字典）"""
         if not query:
             return None
         q = query.strip()
         # 兼容“站”
         if q.endswith("站") and len(q) > 2:
             q = q[:-1]
-        # 1. 精确匹配 name（区分大小写，通常为中文）
-        for s in self.stations:
-            if q == s.name:
-                return s.code
-        # 2. 精确匹配 code（三字码，区分大小写，通常为大写）
-        for s in self.stations:
-            if q == s.code:
-                return s.code
-        return None
\ No newline at end of file
+        # 精确匹配 name 或 code（区分大小写）
+        station = self._by_any.get(q)
+        return station.code if station is not None else None
+
+    async def get_station_code(self, query: str) -> Optional[str]:
+        return self.code_by_name(query)
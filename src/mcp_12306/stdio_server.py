@@ -1,206 +1,248 @@
 """MCP Server 12306 - Stdio Transport Implementation"""
 
 import asyncio
+import functools
 import logging
-from typing import Any
+from typing import Any, Optional
 from mcp.server import Server
-from mcp.types import Tool, TextContent
+from mcp.types import ListToolsRequest, ServerResult, Tool, TextContent
 
-from .services.station_service import StationService
+from . import __version__
+from .stdio_transport import stdio_transport
 
 # 导入现有的工具处理函数
 from .server import (
-    search_stations_validated,
-    query_tickets_validated,
-    query_ticket_price_validated,
-    get_train_no_by_train_code_validated,
-    get_train_route_stations_validated,
-    query_transfer_validated,
-    get_current_time_validated,
+    _TOOL_DISPATCH,
+    _dump,
+    close_http_client,
     station_service as global_station_service,
-    SERVER_NAME
 )
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
 # 创建 MCP Server 实例
 server = Server("mcp-server-12306")
 
-# 工具名称映射到处理函数
-TOOL_HANDLERS = {
-    "query-tickets": query_tickets_validated,
-    "query-ticket-price": query_ticket_price_validated,
-    "search-stations": search_stations_validated,
-    "get-train-no-by-train-code": get_train_no_by_train_code_validated,
-    "get-train-route-stations": get_train_route_stations_validated,
-    "query-transfer": query_transfer_validated,
-    "get-current-time": get_current_time_validated,
-}
+# 工具名称映射到处理函数，与 HTTP 模式共用同一张分发表
+TOOL_HANDLERS = _TOOL_DISPATCH
+
+# 车站数据在后台加载，MCP 握手无需等待；依赖车站数据的工具调用前等待加载完成
+_stations_ready: Optional[asyncio.Task] = None
+# 不依赖车站数据的工具
+_STATION_FREE_TOOLS = frozenset({"get-current-time"})
+
 
 
+# 工具列表是静态的，导入时构建一次，每次 tools/list 直接返回同一个列表
+_TOOL_LIST: list[Tool] = [
+    Tool(
+        name="query-tickets",
+        description="官方12306余票/车次/座席/时刻一站式查询。输入出发站、到达站、日期，返回所有可购车次、时刻、历时、各席别余票等详细信息。支持中文名、三字码。\n\n【智能筛选指南】返回结果通常包含出发/到达城市的所有相关车站（如北京/北京西/北京南）。请根据用户输入语境灵活处理：\n1. 用户仅输入城市名（如'九江'）：请展示所有相关站点的车次，不要过滤。\n2. 用户指定具体车站（如'九江站'）：优先展示匹配车站的车次，但若其他同城车站有更优方案（如时间更短、有票），也应作为补充选项提供。\n请避免机械地仅通过字符串匹配过滤车次，以免遗漏用户可能感兴趣的出行方案。", 
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "from_station": {"type": "string", "description": "出发车站名称"},
+                "to_station": {"type": "string", "description": "到达车站名称"},
+                "train_date": {"type": "string", "description": "出发日期，格式：YYYY-MM-DD"}
+            },
+            "required": ["from_station", "to_station", "train_date"]
+        }
+    ),
+    Tool(
+        name="query-ticket-price",
+        description="查询火车票价信息。输入出发站、到达站、日期，返回各车次的票价详情。支持指定车次号过滤。\n\n【智能筛选指南】返回结果通常包含出发/到达城市的所有相关车站（如北京/北京西/北京南）。请根据用户输入语境灵活处理：\n1. 用户仅输入城市名（如'九江'）：请展示所有相关站点的车次，不要过滤。\n2. 用户指定具体车站（如'九江站'）：优先展示匹配车站的车次，但若其他同城车站有更优方案（如时间更短、有票），也应作为补充选项提供。\n请避免机械地仅通过字符串匹配过滤车次，以免遗漏用户可能感兴趣的出行方案。",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "from_station": {"type": "string", "description": "出发站", "minLength": 1},
+                "to_station": {"type": "string", "description": "到达站", "minLength": 1},
+                "train_date": {"type": "string", "description": "出发日期", "pattern": "^\\d{4}-\\d{2}-\\d{2}$"},
+                "train_code": {"type": "string", "description": "车次号（可选）", "title": "车次号（可选）"},
+                "purpose_codes": {"type": "string", "description": "乘客类型 (ADULT=成人, 0X=学生)", "default": "ADULT", "title": "乘客类型"}
+            },
+            "required": ["from_station", "to_station", "train_date"],
+            "additionalProperties": False
+        }
+    ),
+    Tool(
+        name="search-stations",
+        description="智能车站搜索。支持中文名、拼音、简拼、三字码（Code）。可用于模糊搜索（如“北京”），也可用于精确获取车站代码（如输入“BJP”返回北京站信息）。",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "车站搜索关键词，支持：车站名称、拼音、简拼等", "minLength": 1, "maxLength": 20},
+                "limit": {"type": "integer", "description": "返回结果的最大数量", "minimum": 1, "maximum": 50, "default": 10}
+            },
+            "required": ["query"],
+            "additionalProperties": False
+        }
+    ),
+    Tool(
+        name="query-transfer",
+        description="官方中转换乘方案查询。输入出发站、到达站、日期，可选中转站/无座/学生票，自动分页抓取全部中转方案。",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "from_station": {"type": "string", "description": "出发站"},
+                "to_station": {"type": "string", "description": "到达站"},
+                "train_date": {"type": "string", "description": "出发日期，格式：YYYY-MM-DD"},
+                "middle_station": {"type": "string", "description": "指定中转站（可选）"},
+                "isShowWZ": {"type": "string", "description": "是否显示无座车次（Y/N）", "default": "N"},
+                "purpose_codes": {"type": "string", "description": "乘客类型（00=普通，0X=学生）", "default": "00"}
+            },
+            "required": ["from_station", "to_station", "train_date"]
+        }
+    ),
+    Tool(
+        name="get-train-route-stations",
+        description="列车经停站全表查询。支持输入车次号或官方编号，返回所有经停站、到发时刻、停留时间。",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "train_no": {"type": "string", "description": "车次编码或车次号"},
+                "from_station": {"type": "string", "description": "出发站"},
+                "to_station": {"type": "string", "description": "到达站"},
+                "train_date": {"type": "string", "description": "出发日期，格式：YYYY-MM-DD"}
+            },
+            "required": ["train_no", "from_station", "to_station", "train_date"]
+        }
+    ),
+    Tool(
+        name="get-train-no-by-train-code",
+        description="车次号转官方唯一编号（train_no），支持三字码/全名。常用于经停站查询前置转换。",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "train_code": {"type": "string", "description": "车次号"},
+                "from_station": {"type": "string", "description": "出发站"},
+                "to_station": {"type": "string", "description": "到达站"},
+                "train_date": {"type": "string", "description": "出发日期，格式：YYYY-MM-DD"}
+            },
+            "required": ["train_code", "from_station", "to_station", "train_date"]
+        }
+    ),
+    Tool(
+        name="get-current-time",
+        description="获取当前日期和时间信息，支持相对日期计算。返回当前日期、时间，以及常用的相对日期。",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "timezone": {"type": "string", "description": "时区", "default": "Asia/Shanghai"},
+                "format": {"type": "string", "description": "日期格式", "default": "YYYY-MM-DD"}
+            }
+        }
+    ),
+]
+
 
 @server.list_tools()
 async def list_tools() -> list[Tool]:
     """列出所有可用工具"""
-    return [
-        Tool(
-            name="query-tickets",
-            description="官方12306余票/车次/座席/时刻一站式查询。输入出发站、到达站、日期，返回所有可购车次、时刻、历时、各席别余票等详细信息。支持中文名、三字码。\n\n【智能筛选指南】返回结果通常包含出发/到达城市的所有相关车站（如北京/北京西/北京南）。请根据用户输入语境灵活处理：\n1. 用户仅输入城市名（如'九江'）：请展示所有相关站点的车次，不要过滤。\n2. 用户指定具体车站（如'九江站'）：优先展示匹配车站的车次，但若其他同城车站有更优方案（如时间更短、有票），也应作为补充选项提供。\n请避免机械地仅通过字符串匹配过滤车次，以免遗漏用户可能感兴趣的出行方案。", 
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "from_station": {"type": "string", "description": "出发车站名称"},
-                    "to_station": {"type": "string", "description": "到达车站名称"},
-                    "train_date": {"type": "string", "description": "出发日期，格式：YYYY-MM-DD"}
-                },
-                "required": ["from_station", "to_station", "train_date"]
-            }
-        ),
-        Tool(
-            name="query-ticket-price",
-            description="查询火车票价信息。输入出发站、到达站、日期，返回各车次的票价详情。支持指定车次号过滤。\n\n【智能筛选指南】返回结果通常包含出发/到达城市的所有相关车站（如北京/北京西/北京南）。请根据用户输入语境灵活处理：\n1. 用户仅输入城市名（如'九江'）：请展示所有相关站点的车次，不要过滤。\n2. 用户指定具体车站（如'九江站'）：优先展示匹配车站的车次，但若其他同城车站有更优方案（如时间更短、有票），也应作为补充选项提供。\n请避免机械地仅通过字符串匹配过滤车次，以免遗漏用户可能感兴趣的出行方案。",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "from_station": {"type": "string", "description": "出发站", "minLength": 1},
-                    "to_station": {"type": "string", "description": "到达站", "minLength": 1},
-                    "train_date": {"type": "string", "description": "出发日期", "pattern": "^\\d{4}-\\d{2}-\\d{2}$"},
-                    "train_code": {"type": "string", "description": "车次号（可选）", "title": "车次号（可选）"},
-                    "purpose_codes": {"type": "string", "description": "乘客类型 (ADULT=成人, 0X=学生)", "default": "ADULT", "title": "乘客类型"}
-                },
-                "required": ["from_station", "to_station", "train_date"],
-                "additionalProperties": False
-            }
-        ),
-        Tool(
-            name="search-stations",
-            description="智能车站搜索。支持中文名、拼音、简拼、三字码（Code）。可用于模糊搜索（如“北京”），也可用于精确获取车站代码（如输入“BJP”返回北京站信息）。",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {"type": "string", "description": "车站搜索关键词，支持：车站名称、拼音、简拼等", "minLength": 1, "maxLength": 20},
-                    "limit": {"type": "integer", "description": "返回结果的最大数量", "minimum": 1, "maximum": 50, "default": 10}
-                },
-                "required": ["query"],
-                "additionalProperties": False
-            }
-        ),
-        Tool(
-            name="query-transfer",
-            description="官方中转换乘方案查询。输入出发站、到达站、日期，可选中转站/无座/学生票，自动分页抓取全部中转方案。",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "from_station": {"type": "string", "description": "出发站"},
-                    "to_station": {"type": "string", "description": "到达站"},
-                    "train_date": {"type": "string", "description": "出发日期，格式：YYYY-MM-DD"},
-                    "middle_station": {"type": "string", "description": "指定中转站（可选）"},
-                    "isShowWZ": {"type": "string", "description": "是否显示无座车次（Y/N）", "default": "N"},
-                    "purpose_codes": {"type": "string", "description": "乘客类型（00=普通，0X=学生）", "default": "00"}
-                },
-                "required": ["from_station", "to_station", "train_date"]
-            }
-        ),
-        Tool(
-            name="get-train-route-stations",
-            description="列车经停站全表查询。支持输入车次号或官方编号，返回所有经停站、到发时刻、停留时间。",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "train_no": {"type": "string", "description": "车次编码或车次号"},
-                    "from_station": {"type": "string", "description": "出发站"},
-                    "to_station": {"type": "string", "description": "到达站"},
-                    "train_date": {"type": "string", "description": "出发日期，格式：YYYY-MM-DD"}
-                },
-                "required": ["train_no", "from_station", "to_station", "train_date"]
-            }
-        ),
-        Tool(
-            name="get-train-no-by-train-code",
-            description="车次号转官方唯一编号（train_no），支持三字码/全名。常用于经停站查询前置转换。",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "train_code": {"type": "string", "description": "车次号"},
-                    "from_station": {"type": "string", "description": "出发站"},
-                    "to_station": {"type": "string", "description": "到达站"},
-                    "train_date": {"type": "string", "description": "出发日期，格式：YYYY-MM-DD"}
-                },
-                "required": ["train_code", "from_station", "to_station", "train_date"]
-            }
-        ),
-        Tool(
-            name="get-current-time",
-            description="获取当前日期和时间信息，支持相对日期计算。返回当前日期、时间，以及常用的相对日期。",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "timezone": {"type": "string", "description": "时区", "default": "Asia/Shanghai"},
-                    "format": {"type": "string", "description": "日期格式", "default": "YYYY-MM-DD"}
-                }
-            }
-        ),
-    ]
+    return _TOOL_LIST
+
+
+# SDK 的 tools/list 处理器每次都会重新构建 ListToolsResult。首次调用仍走 SDK 原处理器
+# （保留 SDK 内部的工具缓存等逻辑），之后直接返回缓存的结果对象
+_sdk_list_tools_handler = server.request_handlers[ListToolsRequest]
+_list_tools_result: ServerResult | None = None
+
+
+async def _cached_list_tools_handler(request: ListToolsRequest) -> ServerResult:
+    global _list_tools_result
+    if _list_tools_result is None:
+        _list_tools_result = await _sdk_list_tools_handler(request)
+    return _list_tools_result
+
+
+server.request_handlers[ListToolsRequest] = _cached_list_tools_handler
+
+
+def _error_json(error_msg: str) -> str:
+    """构造错误结果 JSON，只对错误信息做转义，避免其中的引号、换行破坏 JSON 结构"""
+    return f'{{"success":false,"error":{_dump(error_msg)}}}'
+
+
+# 常量错误响应在导入时构建一次，出错时直接返回同一个列表
+_ERR_BAD_FORMAT = [TextContent(type="text", text='{"success":false,"error":"工具返回格式错误"}')]
+
+
+@functools.lru_cache(maxsize=32)
+def _unknown_tool_result(name: str) -> list[TextContent]:
+    """未知工具的错误响应，按工具名缓存"""
+    return [TextContent(type="text", text=_error_json(f"未知工具: {name}"))]
 
 
 @server.call_tool()
 async def call_tool(name: str, arguments: Any) -> list[TextContent]:
     """调用工具"""
-    logger.info(f"调用工具: {name}, 参数: {arguments}")
+    logger.info("调用工具: %s, 参数: %s", name, arguments)
     
     try:
         # 获取工具处理函数
         handler = TOOL_HANDLERS.get(name)
         if not handler:
-            error_msg = f"未知工具: {name}"
-            logger.error(error_msg)
-            return [TextContent(type="text", text=f'{{"success": false, "error": "{error_msg}"}}')]
+            logger.error("未知工具: %s", name)
+            return _unknown_tool_result(name)
+        
+        if _stations_ready is not None and name not in _STATION_FREE_TOOLS:
+            if _stations_ready.cancelled():
+                _start_station_load()
+            # shield 保证单个调用被取消或超时时不会连带取消共享的加载任务
+            await asyncio.shield(_stations_ready)
         
         # 调用工具处理函数
         result = await handler(arguments if arguments else {})
         
-        # 转换结果格式
+        # 处理函数直接返回 TextContent 列表
         if result and isinstance(result, list):
-            text_contents = []
-            for item in result:
-                if isinstance(item, dict) and item.get("type") == "text":
-                    text_contents.append(TextContent(type="text", text=item["text"]))
-            return text_contents if text_contents else [TextContent(type="text", text='{"success": false, "error": "工具返回格式错误"}')]
-        else:
-            return [TextContent(type="text", text='{"success": false, "error": "工具返回格式错误"}')]
+            return result
+        return _ERR_BAD_FORMAT
             
     except Exception as e:
         error_msg = f"工具执行失败: {str(e)}"
         logger.error(error_msg, exc_info=True)
-        return [TextContent(type="text", text=f'{{"success": false, "error": "{error_msg}"}}')]
+        return [TextContent(type="text", text=_error_json(error_msg))]
+
+
+def _log_stations_loaded(task: asyncio.Task):
+    """车站数据加载任务结束时记录结果"""
+    if task.cancelled():
+        logger.warning("车站数据加载被取消，下次工具调用时将重新加载")
+        return
+    if task.exception() is not None:
+        logger.error("加载车站数据失败: %s", task.exception())
+    else:
+        logger.info("已加载 %d 个车站", len(global_station_service.stations))
+
+
+def _start_station_load():
+    """启动后台车站数据加载任务"""
+    global _stations_ready
+    logger.info("正在加载车站数据...")
+    _stations_ready = asyncio.create_task(global_station_service.load_stations())
+    _stations_ready.add_done_callback(_log_stations_loaded)
 
 
 async def run_stdio_server():
     """运行 stdio 服务器"""
-    import os
-    import sys
-    import mcp_12306
-
     logger.info("启动 mcp-server-12306 (stdio 模式)...")
-    logger.info(f"版本: {mcp_12306.__version__}")
+    logger.info("版本: %s", __version__)
     
-    logger.info("正在加载车站数据...")
-    
-    # 加载车站数据
-    await global_station_service.load_stations()
-    logger.info(f"已加载 {len(global_station_service.stations)} 个车站")
+    # 后台加载车站数据，与客户端握手并行
+    _start_station_load()
     
     # 运行服务器
-    from mcp.server.stdio import stdio_server
-    
-    async with stdio_server() as (read_stream, write_stream):
-        logger.info("MCP Server 已启动，等待客户端连接...")
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options()
-        )
+    try:
+        async with stdio_transport() as (read_stream, write_stream):
+            logger.info("MCP Server 已启动，等待客户端连接...")
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options()
+            )
+    finally:
+        if not _stations_ready.done():
+            # 关闭时的取消无需重新加载，也不需要记录
+            _stations_ready.remove_done_callback(_log_stations_loaded)
+            _stations_ready.cancel()
+        await close_http_client()
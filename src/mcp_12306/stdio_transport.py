@@ -0,0 +1,266 @@
+"""MCP Server 12306 - Stdio Transport
+
+直接基于文件描述符的 stdio 传输层，替代 mcp SDK 默认的按行读取 TextIOWrapper 的实现：
+通过 loop.add_reader 监听 stdin，数据直接读入预分配的缓冲区，按换行切分后立即解析为
+JSON-RPC 消息；stdout 通过写队列和 loop.add_writer 非阻塞写出。
+没有额外的 StreamReader / 管道传输层，也不需要后台线程。
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from collections import deque
+from contextlib import asynccontextmanager
+
+import anyio
+import anyio.lowlevel
+import mcp.types as types
+from mcp.server.stdio import stdio_server as sdk_stdio_server
+from mcp.shared.message import SessionMessage
+
+logger = logging.getLogger(__name__)
+
+# stdin 读缓冲区大小
+READ_BUFFER_SIZE = 64 * 1024
+
+# 待处理消息队列的高/低水位，超过高水位时暂停读取 stdin
+QUEUE_HIGH_WATER = 64
+QUEUE_LOW_WATER = 16
+
+# stdin 关闭后等待已收到请求全部响应的最长时间（秒）
+EOF_DRAIN_TIMEOUT = 30
+
+
+class StdioChannel:
+    """stdin/stdout 文件描述符通道：stdin 复用同一块缓冲区接收数据，按行解析 JSON-RPC 消息后放入队列"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, in_fd: int, out_fd: int):
+        self._loop = loop
+        self._queue = queue
+        self._in_fd = in_fd
+        self._out_fd = out_fd
+        self._stdin = open(in_fd, "rb", buffering=0, closefd=False)
+        self._buffer = bytearray(READ_BUFFER_SIZE)
+        self._view = memoryview(self._buffer)
+        self._pending = bytearray()
+        self._write_queue: deque = deque()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._blocking = (os.get_blocking(in_fd), os.get_blocking(out_fd))
+        self._reading = False
+        self._closed = False
+        self.paused = False
+
+    def start(self):
+        """设置非阻塞并开始监听 stdin，失败时抛出 OSError / NotImplementedError"""
+        os.set_blocking(self._in_fd, False)
+        os.set_blocking(self._out_fd, False)
+        try:
+            self._loop.add_reader(self._in_fd, self._read_ready)
+        except BaseException:
+            self._restore_blocking()
+            raise
+        self._reading = True
+
+    def _read_ready(self):
+        try:
+            nbytes = self._stdin.readinto(self._view)
+        except OSError as e:
+            logger.error("读取 stdin 失败: %s", e)
+            nbytes = 0
+        if nbytes is None:
+            return
+        if nbytes == 0:
+            self._stop_reading()
+            # 最后一条消息可能没有换行结尾，EOF 时仍需处理
+            if self._pending.strip():
+                self._dispatch(bytes(self._pending))
+            self._pending.clear()
+            self._queue.put_nowait(None)
+            return
+
+        start = 0
+        while True:
+            end = self._buffer.find(b"\n", start, nbytes)
+            if end < 0:
+                break
+            if self._pending:
+                self._pending += self._view[start:end]
+                self._dispatch(bytes(self._pending))
+                self._pending.clear()
+            else:
+                self._dispatch(self._buffer[start:end])
+            start = end + 1
+        if start < nbytes:
+            # 不完整的一行，缓存到下一次读取
+            self._pending += self._view[start:nbytes]
+
+        if not self.paused and self._queue.qsize() >= QUEUE_HIGH_WATER:
+            self.paused = True
+            self._stop_reading()
+
+    def _dispatch(self, line):
+        if not line.strip():
+            return
+        try:
+            message = types.JSONRPCMessage.model_validate_json(line)
+        except Exception as exc:
+            self._queue.put_nowait(exc)
+            return
+        self._queue.put_nowait(SessionMessage(message))
+
+    def _stop_reading(self):
+        if self._reading:
+            self._loop.remove_reader(self._in_fd)
+            self._reading = False
+
+    def resume_if_drained(self):
+        if self.paused and self._queue.qsize() <= QUEUE_LOW_WATER and not self._closed:
+            self.paused = False
+            self._loop.add_reader(self._in_fd, self._read_ready)
+            self._reading = True
+
+    def write(self, data: bytes):
+        """写出数据，写队列为空时直接 os.write，剩余部分排队等待 stdout 可写"""
+        if self._closed:
+            return
+        if not self._write_queue:
+            try:
+                written = os.write(self._out_fd, data)
+            except BlockingIOError:
+                written = 0
+            except OSError as e:
+                # 如客户端已关闭 stdout（EPIPE），与 _write_ready 一样记录后丢弃；写队列为空，drained 保持 set
+                logger.error("写入 stdout 失败: %s", e)
+                return
+            if written == len(data):
+                return
+            data = memoryview(data)[written:]
+            self._loop.add_writer(self._out_fd, self._write_ready)
+            self._drained.clear()
+        self._write_queue.append(data)
+
+    def _write_ready(self):
+        while self._write_queue:
+            data = self._write_queue[0]
+            try:
+                written = os.write(self._out_fd, data)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                logger.error("写入 stdout 失败: %s", e)
+                self._write_queue.clear()
+                break
+            if written < len(data):
+                self._write_queue[0] = memoryview(data)[written:]
+                return
+            self._write_queue.popleft()
+        self._loop.remove_writer(self._out_fd)
+        self._drained.set()
+
+    async def drain(self):
+        await self._drained.wait()
+
+    def _restore_blocking(self):
+        os.set_blocking(self._in_fd, self._blocking[0])
+        os.set_blocking(self._out_fd, self._blocking[1])
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stop_reading()
+        if self._write_queue:
+            self._loop.remove_writer(self._out_fd)
+            self._write_queue.clear()
+            self._drained.set()
+        self._restore_blocking()
+
+
+def _shares_stderr(out_fd: int) -> bool:
+    """
+    stdout 与 stderr 是否指向同一个文件（如启动器把两者重定向到同一管道）。
+    此时两者共享非阻塞标志，设置 stdout 非阻塞会让 stderr 日志写入抛出 BlockingIOError
+    """
+    try:
+        out_stat = os.fstat(out_fd)
+        err_stat = os.fstat(sys.stderr.fileno())
+    except (OSError, ValueError, AttributeError):
+        return False
+    return (out_stat.st_dev, out_stat.st_ino) == (err_stat.st_dev, err_stat.st_ino)
+
+
+@asynccontextmanager
+async def stdio_transport():
+    """
+    stdio 传输层，返回 (read_stream, write_stream)，与 mcp.server.stdio.stdio_server 接口一致。
+    Windows、交互式终端或 stdout 与 stderr 指向同一文件时回退到 SDK 默认实现。
+    """
+    if sys.platform == "win32" or sys.stdin.isatty() or _shares_stderr(sys.stdout.fileno()):
+        async with sdk_stdio_server() as streams:
+            yield streams
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    channel = StdioChannel(loop, queue, sys.stdin.fileno(), sys.stdout.fileno())
+    try:
+        channel.start()
+    except (NotImplementedError, OSError) as e:
+        # 例如 stdin 为普通文件时 epoll 不支持监听
+        logger.warning("无法直接监听 stdin，回退到默认实现: %s", e)
+        async with sdk_stdio_server() as streams:
+            yield streams
+        return
+
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+
+    # 已收到但尚未响应的请求 id。读流一关闭会话就会结束并关闭写流，
+    # 因此 stdin 关闭后要先等这些请求的响应写出，再关闭读流
+    pending_ids: set = set()
+    all_answered = asyncio.Event()
+    all_answered.set()
+
+    async def stdin_reader():
+        try:
+            async with read_stream_writer:
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        with anyio.move_on_after(EOF_DRAIN_TIMEOUT):
+                            await all_answered.wait()
+                        break
+                    channel.resume_if_drained()
+                    if isinstance(item, SessionMessage) and isinstance(item.message.root, types.JSONRPCRequest):
+                        pending_ids.add(item.message.root.id)
+                        all_answered.clear()
+                    await read_stream_writer.send(item)
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+
+    async def stdout_writer():
+        try:
+            async with write_stream_reader:
+                async for session_message in write_stream_reader:
+                    json = session_message.message.model_dump_json(
+                        by_alias=True, exclude_none=True
+                    )
+                    channel.write(json.encode("utf-8") + b"\n")
+                    await channel.drain()
+                    root = session_message.message.root
+                    if isinstance(root, (types.JSONRPCResponse, types.JSONRPCError)):
+                        pending_ids.discard(root.id)
+                        if not pending_ids:
+                            all_answered.set()
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+
+    try:
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(stdin_reader)
+            tg.start_soon(stdout_writer)
+            yield read_stream, write_stream
+    finally:
+        channel.close()
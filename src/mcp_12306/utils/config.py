@@ -12,6 +12,7 @@ class Settings(BaseSettings):
     """应用配置"""
     server_host: str = Field(default="0.0.0.0", description="服务器主机地址")
     server_port: int = Field(default=8000, description="服务器端口")
+    server_workers: int = Field(default=1, description="HTTP 服务工作进程数，会话仅在各自进程内有效")
     debug: bool = Field(default=False, description="调试模式")
     log_level: str = Field(default="INFO", description="日志级别")
 
@@ -38,7 +39,7 @@ def get_settings() -> Settings:
         
         try:
             _settings = Settings()
-            logger.info(f"配置加载成功 - 主机: {_settings.server_host}, 端口: {_settings.server_port}, 调试模式: {_settings.debug}, 日志级别: {_settings.log_level}")
+            logger.info(f"配置加载成功 - 主机: {_settings.server_host}, 端口: {_settings.server_port}, 工作进程: {_settings.server_workers}, 调试模式: {_settings.debug}, 日志级别: {_settings.log_level}")
         except Exception as e:
             logger.error(f"配置加载失败: {e}，使用默认配置")
             _settings = Settings.model_validate({})
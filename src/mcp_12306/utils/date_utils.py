@@ -1,20 +1,44 @@
 """日期工具"""
 
-from datetime import datetime, date, timedelta
+from datetime import date, timedelta
+from typing import Optional
 import re
 
 
-def validate_date(date_str: str) -> bool:
-    """验证日期格式"""
-    pattern = r'^\d{4}-\d{2}-\d{2}$'
-    if not re.match(pattern, date_str):
-        return False
-        
+# YYYY-MM-DD，分组直接取出年月日，避免再用 strptime 解析；使用 fullmatch，末尾换行也不接受
+_DATE_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+# 12306 提前售票天数
+MAX_ADVANCE_DAYS = 14
+
+# 12306 可查询日期范围 (今天, 今天字符串, 最晚日期字符串)，按天缓存
+_date_range_cache: Optional[tuple[date, str, str]] = None
+
+
+def _get_date_range() -> tuple[date, str, str]:
+    """获取当天的可查询日期范围，同一天内的重复调用直接复用缓存"""
+    global _date_range_cache
+    today = date.today()
+    if _date_range_cache is None or _date_range_cache[0] != today:
+        max_date = today + timedelta(days=MAX_ADVANCE_DAYS)
+        _date_range_cache = (today, today.isoformat(), max_date.isoformat())
+    return _date_range_cache
+
+
+def _parse_date(date_str: str) -> Optional[date]:
+    """解析 YYYY-MM-DD 日期，格式或日期本身无效时返回 None"""
+    m = _DATE_RE.fullmatch(date_str)
+    if not m:
+        return None
     try:
-        datetime.strptime(date_str, "%Y-%m-%d")
-        return True
+        return date(int(m[1]), int(m[2]), int(m[3]))
     except ValueError:
-        return False
+        return None
+
+
+def validate_date(date_str: str) -> bool:
+    """验证日期格式"""
+    return _parse_date(date_str) is not None
 
 
 def validate_date_not_past(date_str: str) -> tuple[bool, str]:
@@ -26,24 +50,17 @@ def validate_date_not_past(date_str: str) -> tuple[bool, str]:
     - 不能查询历史日期（当天前）
     - 不能查询超过14天后的日期
     """
-    # 先验证格式
-    if not validate_date(date_str):
+    # 只解析一次，格式校验与范围比较共用同一个 date 对象
+    query_date = _parse_date(date_str)
+    if query_date is None:
         return False, "日期格式错误，请使用 YYYY-MM-DD 格式"
     
-    try:
-        dt = datetime.strptime(date_str, "%Y-%m-%d")
-        query_date = dt.date()
-        today = date.today()
-        max_date = today + timedelta(days=14)
-        
-        # 检查是否早于今天
-        if query_date < today:
-            return False, f"出发日期不能早于今天（{today.strftime('%Y-%m-%d')}），12306无法查询历史日期的车次信息"
-        
-        # 检查是否超过14天后
-        if query_date > max_date:
-            return False, f"出发日期不能晚于{max_date.strftime('%Y-%m-%d')}，12306仅支持提前14天购票"
-        
+    today, today_str, max_date_str = _get_date_range()
+    
+    # 与今天相差的天数，一次整数比较覆盖两端；错误信息只在无效时构造
+    delta = (query_date - today).days
+    if 0 <= delta <= MAX_ADVANCE_DAYS:
         return True, ""
-    except Exception as e:
-        return False, f"日期校验失败: {str(e)}"
\ No newline at end of file
+    if delta < 0:
+        return False, f"出发日期不能早于今天（{today_str}），12306无法查询历史日期的车次信息"
+    return False, f"出发日期不能晚于{max_date_str}，12306仅支持提前14天购票"
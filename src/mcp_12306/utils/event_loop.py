@@ -0,0 +1,34 @@
+"""事件循环工具，stdio 与 HTTP 两个入口共用"""
+
+import asyncio
+import sys
+
+
+def _loop_factory():
+    """优先使用 uvloop（基于 libuv 的事件循环），不可用时（如 Windows）返回 None 使用标准 asyncio"""
+    try:
+        import uvloop
+    except ImportError:
+        return None
+    # uvloop.run 仅在 uvloop >= 0.18 提供，new_event_loop 在各版本中均可用
+    return uvloop.new_event_loop
+
+
+def run_event_loop(coro):
+    """在新的事件循环中运行协程"""
+    loop_factory = _loop_factory()
+    if sys.version_info >= (3, 11):
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            return runner.run(coro)
+
+    # Python 3.10 没有 asyncio.Runner
+    loop = loop_factory() if loop_factory else asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        try:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()